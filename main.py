@@ -7,11 +7,11 @@ from src.load.load import ejecucion_carga
 import sys
 
 
-def run_extract(logger, full_load: bool = True):
+def run_extract(logger, full_load: bool = True, refrescar_cache: bool = False):
     # Extraer todos los datos
     logger.info("Iniciando extracción de datos...")
     try:
-        all_data = extract_all(logger, full_load=full_load)
+        all_data = extract_all(logger, refrescar_cache=refrescar_cache)
     except Exception as e:
         logger.info(f"❌ Error en extracción: {e}")
         return
@@ -19,26 +19,29 @@ def run_extract(logger, full_load: bool = True):
         logger.info("⚠️ all_data está vacío. No hay datasets para transformar/guardar.")
         return
     # Transformar y guardar
-    for name, df in all_data.items():
+    for name, extraccion in all_data.items():
         logger.info(f"\n🔄 Transformando {name}...")
         try:
-            df_transformed = transform_dataset(df, name)
-            if df_transformed is None:
-                logger.info(f"⚠️ transform_dataset devolvió None para {name}, se omite.")
-                continue
-            # Si es un DataFrame, opcionalmente comprobar si está vacío
-            try:
-                is_empty = getattr(df_transformed, "empty", False)
-                if is_empty:
-                    logger.info(
-                        f"⚠️ El DataFrame transformado de {name} está vacío, se omite."
-                    )
+            guardados = 0
+            # Bloque a bloque desde data/tmp: la memoria no depende del tamaño del endpoint
+            for df in extraccion.bloques():
+                df_transformed = transform_dataset(df, name)
+                if df_transformed is None:
+                    logger.info(f"⚠️ transform_dataset devolvió None para {name}, se omite.")
+                    continue
+                # Si es un DataFrame, opcionalmente comprobar si está vacío
+                if getattr(df_transformed, "empty", False):
                     continue
-            except Exception:
-                pass
-            # Guardar en process/
-            # load_to_parquet(df_transformed, name)
-            load_to_csv(logger, df_transformed, name, full_load=full_load)
+                # Guardar en process/ (el primer bloque respeta full_load; los
+                # siguientes se fusionan con lo ya guardado)
+                # load_to_parquet(df_transformed, name)
+                load_to_csv(logger, df_transformed, name, full_load=full_load or guardados > 0)
+                guardados += 1
+            if not guardados:
+                logger.info(f"⚠️ El DataFrame transformado de {name} está vacío, se omite.")
+                continue
+            # El checkpoint solo avanza con los datos ya guardados en data/raw
+            extraccion.confirmar(logger)
             logger.info(f"✅ {name} procesado y guardado.")
         except Exception as e:
             logger.info(f"❌ Error procesando {name}: {e}")
@@ -47,28 +50,36 @@ def run_extract(logger, full_load: bool = True):
 def run_extract_times(logger):
     """
     Función específica para extraer y guardar los tiempos de los deals.
+    Solo se consultan los deals nuevos o modificados desde la ejecución anterior.
     """
     logger.info(f"\n🔄 Transformando deal_times...")
-    #df_times = extraccion_tiempos(logger)
-    #transform_dataset(df_times, "deal_times")
-    #load_to_csv(logger, df_times, "deal_times")
+    try:
+        df_times = extract_deal_times(logger)
+    except Exception as e:
+        logger.info(f"❌ Error procesando deal_times: {e}")
+        return
+    if df_times is None:
+        logger.info("✅ deal_times sin cambios.")
+        return
     logger.info(f"✅ deal_times procesado y guardado.")
 
 
-def run_transform(logger):
+def run_transform(logger, force=False):
     """
     Función principal para cargar y limpiar archivos CSV en una carpeta dada.
+    Con force=True se transforman también los datasets sin cambios.
     """
     logger.info(f"\n 🛠️Iniciando transfomraciones en: data/raw")
-    limpiar_archivos(logger)
+    limpiar_archivos(logger, force=force)
     logger.info("\nLimpieza completada.")
 
-def run_load(logger):
+def run_load(logger, force=False):
     """
     Función principal para cargar archivos Parquet desde data/stage a la base de datos SQL.
+    Con force=True se cargan también las tablas sin cambios.
     """
     logger.info(f"\n📤Iniciando carga de datos a la base de datos SQL...")
-    ejecucion_carga(logger)
+    ejecucion_carga(logger, force=force)
     logger.info("\nCarga completada.")
 
 # =============================
@@ -76,22 +87,26 @@ def run_load(logger):
 # =============================
 if __name__ == "__main__":
     modo = sys.argv[1] if len(sys.argv) > 1 else "full"
+    # --refrescar-cache: ignora la caché de endpoints de referencia
+    refrescar_cache = "--refrescar-cache" in sys.argv
+    # --force: transforma y carga todos los datasets aunque no hayan cambiado
+    force = "--force" in sys.argv
 
     logger = config_logger()
 
     if modo == "1":
-        run_extract(logger, full_load=True)
-        run_transform(logger)
-        run_load(logger)
+        run_extract(logger, full_load=True, refrescar_cache=refrescar_cache)
+        run_transform(logger, force=force)
+        run_load(logger, force=force)
 
     elif modo == "2":
-        run_extract(logger, full_load=True)
+        run_extract(logger, full_load=True, refrescar_cache=refrescar_cache)
         run_extract_times(logger)
-        run_transform(logger)
-        run_load(logger)
+        run_transform(logger, force=force)
+        run_load(logger, force=force)
 
     elif modo == "3":
-        run_transform(logger)
-        run_load(logger)
+        run_transform(logger, force=force)
+        run_load(logger, force=force)
 
     logger.info("Proceso ETL completado.")
@@ -0,0 +1,59 @@
+import json
+import time
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent.parent
+
+# Carpeta de la caché de respuestas de endpoints de referencia
+CACHE_DIR = root / "data" / "cache"
+
+
+class ResponseCache:
+    """
+    Caché en disco de un endpoint completo (todas sus páginas).
+    Guarda los resultados junto con la hora de guardado y las cabeceras
+    ETag / Last-Modified para hacer peticiones condicionales.
+    """
+
+    def __init__(self, endpoint: str, folder: Path = None):
+        folder = Path(folder or CACHE_DIR)
+        self.path = folder / f"{endpoint.strip('/').replace('/', '_')}.json"
+
+    def leer(self) -> dict:
+        """Devuelve la entrada guardada o None si no existe o está corrupta."""
+        if not self.path.exists():
+            return None
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def guardar(self, results: list, etag: str = None, last_modified: str = None):
+        """Guarda los resultados y marca la hora actual."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        entrada = {
+            "guardado": time.time(),
+            "etag": etag,
+            "last_modified": last_modified,
+            "results": results,
+        }
+        self.path.write_text(json.dumps(entrada, ensure_ascii=False), encoding="utf-8")
+
+    def renovar(self, entrada: dict):
+        """Reinicia el TTL de una entrada validada con un 304."""
+        self.guardar(entrada["results"], entrada.get("etag"), entrada.get("last_modified"))
+
+    @staticmethod
+    def vigente(entrada: dict, ttl_horas: float) -> bool:
+        """True si la entrada tiene menos de ttl_horas."""
+        return time.time() - entrada.get("guardado", 0) < ttl_horas * 3600
+
+    @staticmethod
+    def cabeceras_condicionales(entrada: dict) -> dict:
+        """If-None-Match / If-Modified-Since a partir de la entrada guardada."""
+        headers = {}
+        if entrada.get("etag"):
+            headers["If-None-Match"] = entrada["etag"]
+        if entrada.get("last_modified"):
+            headers["If-Modified-Since"] = entrada["last_modified"]
+        return headers
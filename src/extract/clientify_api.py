@@ -1,11 +1,41 @@
 import requests
 import pandas as pd
 import os
+import threading
 import time
-from datetime import datetime, timezone
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+from src.extract.rate_limiter import RateLimiter, backoff_jitter, parse_retry_after
+from src.extract.cache import ResponseCache
+from src.extract.load import read_raw, ruta_raw
+from src.extract.sink import NDJSONSink
+from src.extract.utils import read_checkpoints, update_checkpoint
+
+# Estados que indican saturación o fallo transitorio: se reintentan
+ESTADOS_REINTENTO = {429, 500, 502, 503, 504}
+
+# Campo de filtro incremental por endpoint (<campo>[gte]).
+# Los endpoints que no aparecen (referencia) se descargan completos.
+CAMPO_INCREMENTAL = {
+    "/contacts/": "modified",
+    "/companies/": "modified",
+    "/deals/": "modified",
+    "/tasks/": "modified",
+    "/calls/": "created",
+}
+
+# Endpoints de referencia (cambian poco): se sirven desde caché en disco
+# mientras no venza el TTL (CACHE_TTL_HORAS en .env, 24 h por defecto)
+ENDPOINTS_CACHE = {
+    "/users/",
+    "/deals/pipelines/stages/",
+    "/tasks/types/",
+    "/deals/pipelines/",
+}
 
 
 def config(logger):
@@ -35,97 +65,392 @@ def config(logger):
 
 def load_incremental_fecha(
     logger,
+    endpoint: str,
     archivo: str = "ultima_fecha.txt",
     full_load: bool = True
     ) -> str:
-    """Si full_load = True, no utiliza la fecha de archivo"""
+    """
+    Devuelve la marca de agua del endpoint (checkpoint propio en
+    config/checkpoints.json). Si full_load = True, no aplica filtro.
+    Sin checkpoint se usa ultima_fecha.txt (compatibilidad) o la fecha inicial.
+    """
     if full_load == True:
         return None
 
+    campo = CAMPO_INCREMENTAL.get(endpoint)
+    checkpoint = read_checkpoints().get(endpoint, {})
+
+    if checkpoint.get("campo") == campo and checkpoint.get("valor"):
+        fecha_desde = checkpoint["valor"]
+        logger.info(f"📅 {endpoint} - Usando checkpoint {campo}: {fecha_desde}")
+    elif os.path.exists(archivo):
+        with open(archivo, "r") as f:
+            fecha_desde = f.read().strip()
+            fecha_desde = fecha_desde[:16]  # <-- quitar segundos
+            logger.info(f"📅 {endpoint} - Usando fecha desde archivo: {fecha_desde}")
     else:
-        archivo_fecha = "ultima_fecha.txt"
-        fecha_desde = None
+        fecha_desde = "2024-01-01T00:00"
+        logger.info(f"⚠ {endpoint} - Usando fecha inicial: {fecha_desde}")
 
-        if not fecha_desde:
-            if os.path.exists(archivo_fecha):
-                with open(archivo_fecha, "r") as f:
-                    fecha_desde = f.read().strip()
-                    fecha_desde = fecha_desde[:16]  # <-- quitar segundos
-                    logger.info(f"📅 Usando fecha desde archivo: {fecha_desde}")
-            else:
-                fecha_desde = "2024-01-01T00:00"
-                logger.info(f"⚠ Usando fecha inicial: {fecha_desde}")
+    return fecha_desde
 
-        params = {}
-        params["created[gte]"] = fecha_desde  # <-- formato válido
 
-        return fecha_desde
+def marca_checkpoint(endpoint: str, df: pd.DataFrame) -> dict:
+    """
+    Marca de agua candidata: el mayor valor de CAMPO_INCREMENTAL en df
+    (None si el endpoint no es incremental o no hay fechas válidas).
+    """
+    campo = CAMPO_INCREMENTAL.get(endpoint)
+    if not campo or df.empty or campo not in df.columns:
+        return None
 
+    fechas = pd.to_datetime(df[campo], errors="coerce", utc=True, format="ISO8601")
+    maximo = fechas.max()
+    if pd.isna(maximo):
+        return None
 
-def fetch_data(
-    logger,
-    endpoint: str,
-    per_page: int = 100,
-    delay: float = 0.4,
-    params: dict = None,
-    full_load: bool = False,
-) -> pd.DataFrame:
+    # Formato sin segundos: gte sobre el minuto vuelve a traer ese minuto (sin huecos)
+    return {"campo": campo, "valor": maximo.strftime("%Y-%m-%dT%H:%M")}
 
-    params = params or {}
-    params["created[gte]"] = load_incremental_fecha(logger, full_load=full_load)
-    BASE_URL, headers, _ = config(logger)
-    url = f"{BASE_URL}{endpoint}"
-    all_results = []
-    page = 1
 
-    while True:
-        params_page = {**params, "page": page, "page_size": per_page}
-        resp = requests.get(url, headers=headers, params=params_page)
+def guardar_checkpoint(logger, endpoint: str, marca: dict):
+    """
+    Guarda la marca de agua del endpoint (ver marca_checkpoint).
+    Solo se llama cuando los datos del endpoint ya están guardados en data/raw.
+    """
+    if not marca:
+        return
+    update_checkpoint(endpoint, marca)
+    logger.info(f"💾 {endpoint} - Checkpoint {marca['campo']} guardado: {marca['valor']}")
+
+
+class Extraccion:
+    """
+    Resultado de fetch_data: los registros descargados (DataFrame o NDJSONSink)
+    y la marca de agua candidata. Nada se confirma al descargar; después de
+    guardar los datos, confirmar() guarda el checkpoint y borra el estado de
+    reanudación. Si algo falla antes, la siguiente ejecución repite la consulta.
+    """
+
+    def __init__(self, endpoint: str, df: pd.DataFrame = None, sink: NDJSONSink = None):
+        self.endpoint = endpoint
+        self.df = df
+        self.sink = sink
+        self.marca = None
+
+    def __len__(self):
+        return self.sink.rows if self.sink is not None else len(self.df)
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    def _registrar(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Acumula la marca de agua de los registros entregados."""
+        marca = marca_checkpoint(self.endpoint, df)
+        if marca and (self.marca is None or marca["valor"] > self.marca["valor"]):
+            self.marca = marca
+        return df
+
+    def bloques(self, chunk_rows: int = 50000):
+        """
+        DataFrames de hasta chunk_rows registros. Con streaming se leen del
+        NDJSON de uno en uno, así la memoria no depende del tamaño del endpoint.
+        """
+        if self.sink is None:
+            yield self._registrar(self.df)
+            return
+        for df in self.sink.iter_frames(chunk_rows):
+            yield self._registrar(df)
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame con todos los registros del endpoint (en memoria)."""
+        if self.df is None:
+            self.df = self.sink.to_frame()
+        return self._registrar(self.df)
+
+    def confirmar(self, logger):
+        """Guarda la marca de agua y borra el archivo temporal del streaming."""
+        guardar_checkpoint(logger, self.endpoint, self.marca)
+        if self.sink is not None:
+            self.sink.cleanup()
+
+
+class ClientifyClient:
+    """
+    Cliente reutilizable para la API de Clientify.
+    Carga la configuración una sola vez, mantiene una Session con conexiones
+    persistentes y descarga páginas en paralelo (max_workers peticiones en vuelo).
+    Todas las peticiones pasan por un RateLimiter compartido (AIMD) y se
+    reintentan con backoff + jitter ante 429/5xx o errores de red.
+    """
+
+    def __init__(
+        self,
+        logger,
+        max_workers: int = 4,
+        per_page: int = 100,
+        timeout: float = 60,
+        max_retries: int = 5,
+        limiter: RateLimiter = None,
+    ):
+        self.logger = logger
+        self.base_url, self.headers, self.endpoints = config(logger)
+        self.max_workers = max_workers
+        self.per_page = per_page
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.limiter = limiter or RateLimiter()
+        self.cache_ttl_horas = float(os.getenv("CACHE_TTL_HORAS", "24"))
+        # Tope global de peticiones en vuelo (compartido por todos los endpoints)
+        self._en_vuelo = threading.BoundedSemaphore(max_workers)
+
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(
+        self, url: str, params: dict = None, headers: dict = None
+    ) -> requests.Response:
+        """
+        GET sobre la sesión compartida, regulado por el limiter.
+        Reintenta 429/5xx y errores de red; si se agotan los reintentos
+        lanza la excepción (o HTTPError) en lugar de devolver datos incompletos.
+        """
+        for intento in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                with self._en_vuelo:
+                    resp = self.session.get(
+                        url, params=params, headers=headers, timeout=self.timeout
+                    )
+            except requests.RequestException as e:
+                if intento == self.max_retries:
+                    raise
+                espera = backoff_jitter(intento)
+                self.logger.info(f"🔁 Error de red en {url}: {e}. Reintento en {espera:.1f}s")
+                self.limiter.on_throttle()
+                time.sleep(espera)
+                continue
+
+            if resp.status_code not in ESTADOS_REINTENTO:
+                self.limiter.on_success()
+                return resp
+
+            retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+            self.limiter.on_throttle(retry_after)
+            if intento == self.max_retries:
+                resp.raise_for_status()
+            espera = backoff_jitter(intento)
+            self.logger.info(
+                f"🔁 {resp.status_code} en {url} (ritmo {self.limiter.rate:.2f} req/s). "
+                f"Reintento en {max(espera, retry_after or 0):.1f}s"
+            )
+            # Si hay Retry-After, el limiter bloquea hasta que venza
+            time.sleep(espera)
+
+    def _fetch_page(self, url: str, endpoint: str, params: dict, page: int):
+        """
+        Descarga una página. Devuelve la lista de resultados, o None si la página
+        no existe (404 = fin de la paginación). Otros errores se propagan para
+        que el endpoint no se dé por completo con datos parciales.
+        """
+        params_page = {**params, "page": page, "page_size": self.per_page}
+        resp = self.get(url, params=params_page)
+
+        if resp.status_code == 404:
+            return None
 
         if resp.status_code != 200:
-            logger.info(f"❌ Error {resp.status_code} en {endpoint}: {resp.text}")
-            break
+            self.logger.info(f"❌ Error {resp.status_code} en {endpoint}: {resp.text}")
+            resp.raise_for_status()
+            return None
+
+        return resp.json().get("results", [])
+
+    def iter_pages(self, endpoint: str, params: dict = None, start_page: int = 1):
+        """
+        Genera (page, results) en orden, manteniendo max_workers páginas en vuelo.
+        Se detiene en la primera página vacía o inexistente; las páginas posteriores
+        que ya estuvieran en vuelo se descartan. Los errores HTTP se propagan.
+        """
+        params = params or {}
+        url = f"{self.base_url}{endpoint}"
+        next_page = start_page
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            en_vuelo = deque()
+            for _ in range(self.max_workers):
+                en_vuelo.append(
+                    (next_page, pool.submit(self._fetch_page, url, endpoint, params, next_page))
+                )
+                next_page += 1
+
+            try:
+                while en_vuelo:
+                    page, future = en_vuelo.popleft()
+                    results = future.result()
+
+                    if not results:
+                        break
+
+                    yield page, results
+
+                    en_vuelo.append(
+                        (next_page, pool.submit(self._fetch_page, url, endpoint, params, next_page))
+                    )
+                    next_page += 1
+            finally:
+                for _, future in en_vuelo:
+                    future.cancel()
+
+    def fetch_data(self, endpoint: str, params: dict = None) -> pd.DataFrame:
+        """Descarga todas las páginas de un endpoint y las normaliza en un DataFrame."""
+        all_results = []
+
+        for page, results in self.iter_pages(endpoint, params):
+            all_results.extend(results)
+            self.logger.info(f"📄 {endpoint} - Página {page}: {len(results)} registros")
+
+        return pd.json_normalize(all_results) if all_results else pd.DataFrame()
+
+    def fetch_to_sink(
+        self,
+        endpoint: str,
+        sink: NDJSONSink,
+        params: dict = None,
+        reanudar: bool = True,
+    ) -> int:
+        """
+        Modo streaming: escribe cada página en el sink en cuanto llega,
+        sin acumular resultados en memoria. Devuelve el total de registros.
+        Tras cada página se guarda el cursor; si una ejecución anterior de la
+        misma consulta quedó a medias, se continúa desde la última página completa.
+        """
+        params = params or {}
+        firma = {"params": params, "page_size": self.per_page}
+        start_page = sink.reanudar(firma) if reanudar else 1
+        if start_page == 1:
+            sink.reset()
+        else:
+            self.logger.info(
+                f"⏯️ {endpoint} - Reanudando desde página {start_page} "
+                f"({sink.rows} registros ya descargados)"
+            )
+
+        for page, results in self.iter_pages(endpoint, params, start_page=start_page):
+            sink.write_page(results)
+            sink.guardar_estado(page, firma)
+            self.logger.info(f"📄 {endpoint} - Página {page}: {len(results)} registros")
+        return sink.rows
+
+    def fetch_cached(
+        self, endpoint: str, params: dict = None, refrescar: bool = False
+    ) -> pd.DataFrame:
+        """
+        Endpoint de referencia con caché en disco:
+        - entrada vigente (TTL) → 0 peticiones,
+        - entrada vencida → petición condicional (ETag / If-Modified-Since)
+          sobre la primera página; un 304 renueva la caché → 1 petición,
+        - sin caché, refrescar=True o contenido cambiado → paginación completa.
+        """
+        params = params or {}
+        cache = ResponseCache(endpoint)
+        entrada = None if refrescar else cache.leer()
+
+        if entrada and cache.vigente(entrada, self.cache_ttl_horas):
+            self.logger.info(f"🗃️ {endpoint} - Desde caché ({len(entrada['results'])} registros)")
+            return pd.json_normalize(entrada["results"]) if entrada["results"] else pd.DataFrame()
+
+        url = f"{self.base_url}{endpoint}"
+        resp = self.get(
+            url,
+            params={**params, "page": 1, "page_size": self.per_page},
+            headers=cache.cabeceras_condicionales(entrada) if entrada else None,
+        )
 
-        data = resp.json()
-        results = data.get("results", [])
+        if resp.status_code == 304 and entrada:
+            cache.renovar(entrada)
+            self.logger.info(f"🗃️ {endpoint} - Sin cambios (304), caché renovada")
+            return pd.json_normalize(entrada["results"]) if entrada["results"] else pd.DataFrame()
 
-        if not results:
-            break
+        if resp.status_code == 404:
+            all_results, data = [], {}
+        elif resp.status_code != 200:
+            self.logger.info(f"❌ Error {resp.status_code} en {endpoint}: {resp.text}")
+            resp.raise_for_status()
+            return pd.DataFrame()
+        else:
+            data = resp.json()
+            all_results = list(data.get("results", []))
+            self.logger.info(f"📄 {endpoint} - Página 1: {len(all_results)} registros")
+
+        # Solo se sigue paginando si la API indica más páginas
+        if all_results and data.get("next", True):
+            for page, results in self.iter_pages(endpoint, params, start_page=2):
+                all_results.extend(results)
+                self.logger.info(f"📄 {endpoint} - Página {page}: {len(results)} registros")
+
+        cache.guardar(all_results, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+        return pd.json_normalize(all_results) if all_results else pd.DataFrame()
 
-        all_results.extend(results)
-        logger.info(f"📄 {endpoint} - Página {page}: {len(results)} registros")
-        page += 1
-        time.sleep(delay)
 
-    if not full_load:
-        archivo_fecha = "ultima_fecha.txt"
-        # Guardar nueva fecha sin segundos
-        fecha_actual = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M")
-        with open(archivo_fecha, "w") as f:
-            f.write(fecha_actual)
-        logger.info(f"💾 Fecha actual guardada: {fecha_actual}")
+def fetch_data(
+    logger,
+    endpoint: str,
+    per_page: int = 100,
+    params: dict = None,
+    full_load: bool = False,
+    client: ClientifyClient = None,
+    streaming: bool = False,
+    refrescar_cache: bool = False,
+) -> Extraccion:
+    """
+    Descarga un endpoint completo aplicando el filtro incremental.
+    Con streaming=True las páginas van a disco (data/tmp) y se leen después
+    por bloques (Extraccion.bloques), sin la lista completa de JSON en memoria;
+    si la ejecución se corta, la siguiente continúa desde la última página.
+    Los endpoints de ENDPOINTS_CACHE se sirven desde caché salvo refrescar_cache.
+    El checkpoint no se mueve aquí: se confirma con Extraccion.confirmar()
+    una vez guardados los datos.
+    """
 
-    return pd.json_normalize(all_results) if all_results else pd.DataFrame()
+    params = params or {}
+    campo = CAMPO_INCREMENTAL.get(endpoint)
+    if campo:
+        params[f"{campo}[gte]"] = load_incremental_fecha(
+            logger, endpoint, full_load=full_load
+        )
+    client = client or ClientifyClient(logger, per_page=per_page)
+
+    if endpoint in ENDPOINTS_CACHE:
+        return Extraccion(endpoint, df=client.fetch_cached(endpoint, params, refrescar=refrescar_cache))
+    if streaming:
+        sink = NDJSONSink(endpoint.strip("/"))
+        client.fetch_to_sink(endpoint, sink, params)
+        # El estado de reanudación se conserva hasta confirmar()
+        return Extraccion(endpoint, sink=sink)
+    return Extraccion(endpoint, df=client.fetch_data(endpoint, params))
 
 
 # 1) ---- LISTAR ID ----
 def listar_deals_id(logger) -> list:
     """
-    Lee deals.csv y retorna los ID únicos
+    Lee deals (CSV o Parquet en data/raw) y retorna los ID únicos
     """
-    deals_csv = (
-        Path(__file__).resolve().parent.parent.parent / "data" / "raw" / "deals.csv"
-    )
+    deals_csv = ruta_raw("deals")
 
     # Validar que exista
-    if not deals_csv.exists():
+    if deals_csv is None:
         logger.warning(
-            f"⚠️ No existe el archivo: {deals_csv.name}. Se retorna lista vacía."
+            f"⚠️ No existe el archivo: deals.csv. Se retorna lista vacía."
         )
         return []
 
     try:
-        df = pd.read_csv(deals_csv)
+        df = read_raw(deals_csv, columns=["id"])
     except Exception as e:
         logger.error(f"❌ Error leyendo {deals_csv.name}: {e}")
         return []
@@ -141,52 +466,126 @@ def listar_deals_id(logger) -> list:
     return deal_ids
 
 
-def extraccion_tiempos(logger, per_page: int = 100, delay: float = 0.5) -> pd.DataFrame:
-    BASE_URL = os.getenv("BASE_URL", "https://api.clientify.net/v1")
-    _, headers, _ = config(logger)
-
-    deal_ids = listar_deals_id(logger)
-
-    # --- Manejo cuando no hay deals id --- #
-    if not deal_ids:
+def listar_deals_modificados(logger) -> pd.DataFrame:
+    """
+    Lee deals (CSV o Parquet en data/raw) y retorna (id, modified) por deal,
+    usando la columna modified o, si no existe, modified_at.
+    DataFrame vacío si no hay datos.
+    """
+    deals_csv = ruta_raw("deals")
+    if deals_csv is None:
+        logger.warning(f"⚠️ No existe el archivo: deals.csv.")
+        return pd.DataFrame(columns=["id", "modified"])
+
+    df = read_raw(deals_csv, columns=["id", "modified", "modified_at"])
+    campo = next((c for c in ("modified", "modified_at") if c in df.columns), None)
+    if "id" not in df.columns or campo is None:
         logger.warning(
-            "⚠️ No hay IDs de deals para procesar. Se retorna DataFrame vacío."
+            f"⚠️ {deals_csv.name} no tiene 'id' y 'modified'/'modified_at'."
         )
-        return pd.DataFrame()
+        return pd.DataFrame(columns=["id", "modified"])
+
+    df = df[["id", campo]].dropna(subset=["id"]).rename(columns={campo: "modified"})
+    return df.drop_duplicates(subset=["id"], keep="last").reset_index(drop=True)
+
+
+def _fetch_deal(logger, client: ClientifyClient, deal_id):
+    """
+    Descarga el detalle de un deal.
+    Devuelve (estado, registros) con estado en {"ok", "404", "error"}.
+    """
+    url = f"{client.base_url}/deals/{deal_id}"
+    logger.info(f"Fetching {url}")
+    try:
+        resp = client.get(url)
+    except requests.RequestException as e:
+        logger.info(f"❌ Error en deal {deal_id} tras reintentos: {e}")
+        return "error", []
+
+    # --- Manejo de errores HTTP --- #
+    if resp.status_code == 404:
+        logger.info(f"⚠️ Deal {deal_id} no existe (404). Saltando...")
+        return "404", []
+
+    if resp.status_code != 200:
+        logger.info(f"❌ Error {resp.status_code} en deal {deal_id}: {resp.text}")
+        return "error", []
+
+    try:
+        data = resp.json()
+    except ValueError as e:
+        # Cuerpo mal formado: solo falla este deal, no toda la descarga
+        logger.info(f"❌ Respuesta no JSON en deal {deal_id}: {e}")
+        return "error", []
+
+    # --- La respuesta esperada es un dict (un solo objeto) --- #
+    registros = [data] if isinstance(data, dict) else []
 
+    for r in registros:
+        r["deal_id"] = deal_id
+    return "ok", registros
+
+
+def _descargar_deals(
+    logger, client: ClientifyClient, deal_ids: list, progreso_cada: int = 500
+):
+    """
+    Descarga el detalle de los deal_ids en paralelo (client.max_workers).
+    Devuelve (registros, ids_no_encontrados) en el orden de deal_ids.
+    """
     all_results = []
     ids_no_encontrados = []
+    total = len(deal_ids)
+    inicio = time.monotonic()
 
-    for deal_id in deal_ids:
-        url = f"{BASE_URL}/deals/{deal_id}"
-        resp = requests.get(url, headers=headers)
-        logger.info(f"Fetching {url}")
+    with ThreadPoolExecutor(max_workers=client.max_workers) as pool:
+        # map conserva el orden de entrada aunque las respuestas lleguen desordenadas
+        resultados = pool.map(lambda d: _fetch_deal(logger, client, d), deal_ids)
 
-        # --- Manejo de errores HTTP --- #
-        if resp.status_code == 404:
-            logger.info(f"⚠️ Deal {deal_id} no existe (404). Saltando...")
-            ids_no_encontrados.append(deal_id)
-            continue
+        for n, (deal_id, (estado, registros)) in enumerate(
+            zip(deal_ids, resultados), start=1
+        ):
+            if estado == "404":
+                ids_no_encontrados.append(deal_id)
+            all_results.extend(registros)
 
-        if resp.status_code != 200:
-            logger.info(f"❌ Error {resp.status_code} en deal {deal_id}: {resp.text}")
-            continue
+            if n % progreso_cada == 0 or n == total:
+                transcurrido = time.monotonic() - inicio
+                logger.info(
+                    f"⏱️ Deals {n}/{total} ({n / total:.0%}) - "
+                    f"{n / transcurrido if transcurrido else 0:.1f} deals/s"
+                )
 
-        data = resp.json()
+    return all_results, ids_no_encontrados
 
-        # --- Si la respuesta es dict (un solo objeto) --- #
-        if isinstance(data, dict):
-            data["deal_id"] = deal_id
-            all_results.append(data)
-            continue
 
-        # --- Si devuelve lista con `results` --- #
-        if isinstance(data, dict) and "results" in data:
-            for r in data["results"]:
-                r["deal_id"] = deal_id
-                all_results.append(r)
+def extraccion_tiempos(
+    logger,
+    per_page: int = 100,
+    client: ClientifyClient = None,
+    progreso_cada: int = 500,
+    deal_ids: list = None,
+) -> pd.DataFrame:
+    """
+    Descarga el detalle de cada deal (/deals/{id}) con concurrencia acotada
+    (client.max_workers) sobre el pool de conexiones del cliente.
+    Los registros conservan el orden de deal_ids (por defecto listar_deals_id).
+    """
+    client = client or ClientifyClient(logger, per_page=per_page)
+
+    if deal_ids is None:
+        deal_ids = listar_deals_id(logger)
+
+    # --- Manejo cuando no hay deals id --- #
+    if not deal_ids:
+        logger.warning(
+            "⚠️ No hay IDs de deals para procesar. Se retorna DataFrame vacío."
+        )
+        return pd.DataFrame()
 
-        time.sleep(delay)
+    all_results, ids_no_encontrados = _descargar_deals(
+        logger, client, deal_ids, progreso_cada
+    )
 
     df = pd.json_normalize(all_results) if all_results else pd.DataFrame()
 
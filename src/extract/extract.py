@@ -1,24 +1,148 @@
 # src/extract.py
 from src.extract.clientify_api import *
+from src.extract.clientify_api import _descargar_deals
+from src.extract.load import load_to_csv, read_raw, ruta_raw
+from src.extract.transform import transform_dataset
+from src.extract.utils import read_deal_times_snapshot, write_deal_times_snapshot
 
 
-def extract_all(logger, full_load: bool = True) -> dict:
+def _extraer_endpoint(
+    logger, client, name: str, endpoint: str, streaming: bool, refrescar_cache: bool
+):
+    """Extrae un endpoint y registra su tiempo y número de filas."""
+    inicio = time.monotonic()
+    # La extracción es incremental (checkpoint por endpoint);
+    # full_load solo decide cómo load_to_csv fusiona con el CSV existente.
+    extraccion = fetch_data(
+        logger,
+        endpoint,
+        full_load=False,
+        client=client,
+        streaming=streaming,
+        refrescar_cache=refrescar_cache,
+    )
+    logger.info(
+        f"⏱️ {name}: {len(extraccion)} registros en {time.monotonic() - inicio:.1f}s"
+    )
+    return extraccion
+
+
+def extract_all(
+    logger,
+    max_workers: int = 4,
+    streaming: bool = True,
+    max_endpoints: int = 4,
+    refrescar_cache: bool = False,
+    limiter: RateLimiter = None,
+) -> dict:
     """
     Extrae datasets desde Clientify y archivos procesados.
-    Devuelve un diccionario con {nombre_dataset: DataFrame}.
+    Devuelve un diccionario con {nombre_dataset: Extraccion}; quien guarda los
+    datos llama a confirmar() de cada uno para mover su checkpoint.
+    Con streaming=True (por defecto) cada página se escribe en disco al llegar
+    y una extracción cortada se reanuda en la siguiente ejecución (ver NDJSONSink).
+
+    Los endpoints se extraen en paralelo (max_endpoints a la vez) compartiendo
+    el cliente: max_workers limita las peticiones en vuelo de toda la extracción.
+    Un endpoint que falla no afecta a los demás.
+    Los endpoints de referencia salen de la caché en disco (ENDPOINTS_CACHE)
+    salvo refrescar_cache=True.
     """
     data = {}
+    inicio = time.monotonic()
     # ===============================
     # === 1 Descargar endpoints generales ===
     # ===============================
-    _, _, endpoints = config(logger)
+    client = ClientifyClient(logger, max_workers=max_workers, limiter=limiter)
+
+    with ThreadPoolExecutor(max_workers=max_endpoints) as pool:
+        futures = {
+            name: pool.submit(
+                _extraer_endpoint,
+                logger,
+                client,
+                name,
+                endpoint,
+                streaming,
+                refrescar_cache,
+            )
+            for name, endpoint in client.endpoints.items()
+        }
 
-    for name, endpoint in endpoints.items():
-        try:
-            df = fetch_data(logger, endpoint, full_load)
-            if df is not None and not df.empty:
-                data[name] = df
-        except Exception as e:
-            logger.info(f"⚠️ No se pudo extraer {name}: {e}")
+        # Se recorre en el orden de config() para que el dict no cambie
+        for name, future in futures.items():
+            try:
+                extraccion = future.result()
+                if extraccion.empty:
+                    # Sin registros no hay nada que guardar: se confirma ya
+                    extraccion.confirmar(logger)
+                else:
+                    data[name] = extraccion
+            except Exception as e:
+                logger.info(f"⚠️ No se pudo extraer {name}: {e}")
 
+    logger.info(
+        f"⏱️ Extracción completa: {len(data)}/{len(futures)} endpoints "
+        f"en {time.monotonic() - inicio:.1f}s"
+    )
     return data
+
+
+def extract_deal_times(logger, client: ClientifyClient = None) -> pd.DataFrame:
+    """
+    Actualiza deal_times solo con los deals nuevos o modificados.
+    Compara el modified actual de deals.csv con el de la ejecución anterior
+    (config/deal_times_modified.json), descarga el detalle de los que cambiaron
+    y los fusiona por deal_id con el deal_times existente en data/raw.
+    Devuelve el dataset completo resultante (o None si no hubo cambios).
+    """
+    actuales = listar_deals_modificados(logger)
+    if actuales.empty:
+        logger.warning("⚠️ No hay deals para procesar deal_times.")
+        return None
+
+    archivo = ruta_raw("deal_times")
+    existente = read_raw(archivo) if archivo is not None else pd.DataFrame()
+    # Sin datos previos (o sin deal_id) se descarga todo
+    previos = read_deal_times_snapshot() if "deal_id" in existente.columns else {}
+
+    modificados = actuales["modified"].astype(str)
+    cambiados = [
+        deal_id
+        for deal_id, modified in zip(actuales["id"], modificados)
+        if previos.get(str(deal_id)) != modified
+    ]
+    logger.info(
+        f"🔎 deal_times: {len(cambiados)}/{len(actuales)} deals nuevos o modificados"
+    )
+    if not cambiados:
+        return None
+
+    client = client or ClientifyClient(logger)
+    registros, ids_no_encontrados = _descargar_deals(logger, client, cambiados)
+    nuevos = pd.json_normalize(registros) if registros else pd.DataFrame()
+    nuevos = transform_dataset(nuevos, "deal_times")
+
+    ids_ok = set(nuevos["deal_id"]) if "deal_id" in nuevos.columns else set()
+    procesados = ids_ok | set(ids_no_encontrados)
+    logger.info(f"\n⛔ Deals no encontrados (404): {ids_no_encontrados}")
+
+    # Fusión por deal_id: se reemplazan los procesados y se quitan los que ya no
+    # están en deals.csv (mismo resultado que una descarga completa)
+    if not existente.empty:
+        existente = existente[
+            ~existente["deal_id"].isin(procesados)
+            & existente["deal_id"].isin(actuales["id"])
+        ]
+    df = pd.concat([existente, nuevos], ignore_index=True)
+
+    load_to_csv(logger, df, "deal_times", full_load=False)
+
+    # El snapshot solo avanza para los deals efectivamente procesados
+    snapshot = dict(previos)
+    for deal_id, modified in zip(actuales["id"], modificados):
+        if deal_id in procesados:
+            snapshot[str(deal_id)] = modified
+    write_deal_times_snapshot(snapshot)
+
+    return df
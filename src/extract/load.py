@@ -1,8 +1,19 @@
 # src/load.py
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 from pathlib import Path
 from dotenv import load_dotenv
 
+from src.extract.schemas import aplicar_esquema, tipos
+
 # Cargar variables desde .env
 from pathlib import Path as P
 
@@ -11,32 +22,519 @@ root = Path(__file__).resolve().parent.parent.parent
 # Carpeta de salida configurable
 DATA_DIR = root / "data" / "raw"
 
+# Filas por bloque al reescribir un CSV existente
+CHUNK_ROWS = 50000
+
+# Formato de la capa raw: "csv" (por defecto) o "parquet" (RAW_FORMAT en .env)
+FORMATOS_RAW = ("csv", "parquet")
+
+# Partes (part-*.parquet) de un dataset raw a partir de las cuales se compacta
+MAX_PARTES = 20
 
-def load_to_csv(logger, df: pd.DataFrame, name: str, folder: Path = DATA_DIR, full_load: bool = True):
+
+def _huellas(df: pd.DataFrame, key: str, version_col: str = None) -> pd.Series:
     """
-    Guarda un DataFrame en formato CSV dentro de la carpeta de process.
+    Huella por fila para detectar cambios: el valor de version_col si se indica,
+    o un hash del contenido de la fila.
+    """
+    if version_col and version_col in df.columns:
+        return df[version_col].astype(str)
+    return pd.util.hash_pandas_object(df.astype(str), index=False).astype(str)
+
+
+def normalizar_claves(serie: pd.Series) -> pd.Series:
+    """
+    Claves como texto comparable con el índice: los ids numéricos quedan sin
+    decimales (6, 6.0 y "6.0" → "6"); vacíos y nulos quedan <NA>.
+    """
+    texto = serie.astype("string").str.strip()
+    texto = texto.str.replace(r"^(-?\d+)\.0*$", r"\1", regex=True)
+    return texto.mask(texto == "")
+
+
+def _claves_validas(logger, df: pd.DataFrame, key: str, nombre: str) -> tuple:
+    """
+    (df sin filas de clave nula, claves normalizadas), ambos sin duplicados
+    (gana la última fila de cada clave). Las filas sin clave no se pueden
+    indexar: se descartan con un aviso en lugar de añadirse como nuevas.
+    """
+    ids = normalizar_claves(df[key])
+    nulas = ids.isna()
+    if nulas.any():
+        logger.warning(f"⚠️ {nombre}: {int(nulas.sum())} filas sin '{key}' descartadas")
+    df, ids = df[~nulas], ids[~nulas]
+    unicas = ~ids.duplicated(keep="last")
+    return df[unicas].reset_index(drop=True), ids[unicas].astype(str).reset_index(drop=True)
+
+
+def leer_indice(file_path: Path) -> dict:
+    """
+    Índice {id: huella} guardado junto al CSV (<name>.idx.json).
+    El índice guarda el tamaño del CSV al que corresponde: si no coincide (el
+    proceso se cortó entre escribir el CSV y el índice) se descarta y
+    devuelve None, igual que si no existe.
+    """
+    file_path = Path(file_path)
+    idx_path = file_path.with_suffix(".idx.json")
+    try:
+        datos = json.loads(idx_path.read_text(encoding="utf-8"))
+        tamano = file_path.stat().st_size
+    except (OSError, ValueError):
+        return None
+    if not isinstance(datos.get("ids"), dict) or datos.get("tamano") != tamano:
+        return None
+    return datos["ids"]
+
+
+def guardar_indice(file_path: Path, indice: dict):
+    """Escribe el índice {id: huella} del CSV (tmp + os.replace) con su tamaño actual."""
+    file_path = Path(file_path)
+    idx_path = file_path.with_suffix(".idx.json")
+    tmp_path = idx_path.with_suffix(".tmp")
+    datos = {"tamano": file_path.stat().st_size, "ids": indice}
+    tmp_path.write_text(json.dumps(datos), encoding="utf-8")
+    os.replace(tmp_path, idx_path)
+
+
+def _indice_desde_csv(file_path: Path, key: str) -> dict:
+    """Reconstruye el índice leyendo solo la columna clave (huella desconocida)."""
+    indice = {}
+    for chunk in pd.read_csv(file_path, usecols=[key], dtype=str, chunksize=CHUNK_ROWS):
+        indice.update(dict.fromkeys(normalizar_claves(chunk[key]).dropna(), None))
+    return indice
+
+
+def upsert_csv(
+    logger,
+    df: pd.DataFrame,
+    file_path: Path,
+    key: str = "id",
+    version_col: str = None,
+):
+    """
+    Fusiona df en el CSV por clave primaria usando el índice en disco:
+    - filas nuevas → se añaden al final (sin releer el archivo),
+    - filas cambiadas → se reemplazan (reescritura por bloques),
+    - filas iguales → no se tocan.
     """
-    if full_load:
-        if df is not None and not df.empty:
-            Path(folder).mkdir(parents=True, exist_ok=True)
-            file_path = f"{folder}/{name}.csv"
-            
-            # Cargar datos existentes si el archivo existe
-            if Path(file_path).exists():
-                existing_df = pd.read_csv(file_path)
-                df = pd.concat([existing_df, df], ignore_index=True)
-                df = df.drop_duplicates(keep='last').reset_index(drop=True)
-            
-            df.to_csv(file_path, index=False, encoding="utf-8-sig")
-            logger.info(f"✅ Guardado en CSV: {file_path} ({len(df)} registros)")
-        else:
-            logger.info(f"⚠️ DataFrame vacío: {name}")
+    file_path = Path(file_path)
+    df, ids = _claves_validas(logger, df, key, file_path.name)
+    huellas = _huellas(df, key, version_col)
 
+    indice = leer_indice(file_path)
+    if indice is None:
+        # Sin índice válido las huellas son desconocidas: los ids presentes se
+        # reemplazan (nunca se duplican) y el índice se reconstruye al final
+        logger.info(f"🔁 Índice de {file_path.name} ausente o desfasado, se reconstruye")
+        indice = _indice_desde_csv(file_path, key)
+
+    previas = ids.map(indice)
+    es_nuevo = ~ids.isin(indice.keys())
+    es_cambiado = ~es_nuevo & (previas != huellas)
+
+    nuevos = df[es_nuevo]
+    cambiados = df[es_cambiado]
+    if nuevos.empty and cambiados.empty:
+        logger.info(f"✅ Sin cambios en {file_path.name}")
+        return
+
+    cabecera = list(pd.read_csv(file_path, nrows=0).columns)
+    columnas_extra = [c for c in df.columns if c not in cabecera]
+
+    if cambiados.empty and not columnas_extra:
+        # Solo altas: append directo con el orden de columnas del archivo
+        nuevos.reindex(columns=cabecera).to_csv(
+            file_path, mode="a", header=False, index=False, encoding="utf-8"
+        )
     else:
-        if df is not None and not df.empty:
-            Path(folder).mkdir(parents=True, exist_ok=True)
-            file_path = f"{folder}/{name}.csv"
-            df.to_csv(file_path, index=False, encoding="utf-8-sig")
-            logger.info(f"✅ Guardado en CSV: {file_path} ({len(df)} registros)")
-        else:
-            logger.info(f"⚠️ DataFrame vacío: {name}")
+        # Reescritura por bloques sin reinterpretar tipos (todo como texto)
+        cabecera = cabecera + columnas_extra
+        ids_cambiados = set(ids[es_cambiado])
+        tmp_path = file_path.with_suffix(".tmp")
+        primero = True
+        for chunk in pd.read_csv(
+            file_path, dtype=str, keep_default_na=False, chunksize=CHUNK_ROWS
+        ):
+            chunk = chunk[~normalizar_claves(chunk[key]).isin(ids_cambiados)].reindex(columns=cabecera)
+            chunk.to_csv(
+                tmp_path,
+                mode="w" if primero else "a",
+                header=primero,
+                index=False,
+                encoding="utf-8-sig" if primero else "utf-8",
+            )
+            primero = False
+        pd.concat([cambiados, nuevos]).reindex(columns=cabecera).to_csv(
+            tmp_path,
+            mode="w" if primero else "a",
+            header=primero,
+            index=False,
+            encoding="utf-8-sig" if primero else "utf-8",
+        )
+        os.replace(tmp_path, file_path)
+
+    indice.update(dict(zip(ids[es_nuevo | es_cambiado], huellas[es_nuevo | es_cambiado])))
+    guardar_indice(file_path, indice)
+    logger.info(
+        f"✅ Upsert en CSV: {file_path} ({len(nuevos)} nuevos, "
+        f"{len(cambiados)} actualizados, {len(indice)} registros)"
+    )
+
+
+def formato_raw() -> str:
+    """Formato configurado para data/raw (RAW_FORMAT), csv si no es válido."""
+    formato = os.getenv("RAW_FORMAT", "csv").lower()
+    return formato if formato in FORMATOS_RAW else "csv"
+
+
+def _a_json(valor):
+    """Serializador JSON para arrays/escalares de numpy que devuelve Arrow."""
+    if isinstance(valor, np.ndarray):
+        return valor.tolist()
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return str(valor)
+
+
+def _a_tabla_arrow(df: pd.DataFrame) -> pa.Table:
+    """
+    Convierte a Arrow conservando listas y structs como tipos nativos.
+    Las columnas anidadas con tipos mezclados (p. ej. custom_fields, cuyo
+    value puede ser texto o lista) se guardan como texto JSON.
+    """
+    columnas = {}
+    for col in df.columns:
+        try:
+            columnas[col] = pa.array(df[col], from_pandas=True)
+            continue
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+        valores = df[col].tolist()
+        anidado = any(isinstance(v, (list, dict, np.ndarray)) for v in valores)
+        texto = []
+        for v in valores:
+            if isinstance(v, (list, dict, np.ndarray)):
+                texto.append(json.dumps(v, ensure_ascii=False, default=_a_json))
+            elif pd.isna(v):
+                texto.append(None)
+            elif anidado and isinstance(v, str):
+                # Ya viene como texto JSON de una partición anterior
+                texto.append(v)
+            else:
+                texto.append(str(v))
+        columnas[col] = pa.array(texto, type=pa.string())
+    return pa.table(columnas)
+
+
+def _partes(dataset: Path) -> list:
+    """Partes del dataset raw Parquet, relativas a su carpeta y en orden."""
+    return sorted(p.relative_to(dataset).as_posix() for p in Path(dataset).rglob("*.parquet"))
+
+
+def leer_indice_parquet(dataset: Path, key: str = "id") -> dict:
+    """
+    Índice {id: huella} del dataset raw Parquet (_index.json). Guarda la lista
+    de partes a la que corresponde; si no coincide (el proceso se cortó entre
+    escribir una parte y el índice) se reconstruye con los ids de las partes y
+    huella desconocida, así esas filas se vuelven a escribir en la próxima parte.
+    """
+    dataset = Path(dataset)
+    try:
+        datos = json.loads((dataset / "_index.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        datos = {}
+    partes = _partes(dataset)
+    if isinstance(datos.get("ids"), dict) and datos.get("partes") == partes:
+        return datos["ids"]
+    indice = {}
+    for parte in partes:
+        if key in pq.read_schema(dataset / parte).names:
+            ids = pq.read_table(dataset / parte, columns=[key]).column(key).to_pandas()
+            indice.update(dict.fromkeys(normalizar_claves(ids).dropna(), None))
+    return indice
+
+
+def guardar_indice_parquet(dataset: Path, indice: dict):
+    """Escribe el índice del dataset (tmp + os.replace) con sus partes actuales."""
+    idx_path = Path(dataset) / "_index.json"
+    tmp_path = idx_path.with_suffix(".tmp")
+    datos = {"partes": _partes(dataset), "ids": indice}
+    tmp_path.write_text(json.dumps(datos), encoding="utf-8")
+    os.replace(tmp_path, idx_path)
+
+
+def load_to_parquet(
+    logger,
+    df: pd.DataFrame,
+    name: str,
+    folder: Path = DATA_DIR,
+    full_load: bool = True,
+    key: str = "id",
+    version_col: str = None,
+):
+    """
+    Capa raw columnar: data/raw/<name>/ingest_date=YYYY-MM-DD/part-*.parquet.
+    Con full_load=True solo se escriben las filas nuevas o cambiadas (índice
+    _index.json, igual que upsert_csv); al leer gana la última versión por id.
+    Con full_load=False se reemplaza el dataset completo.
+    """
+    if df is None or df.empty:
+        logger.info(f"⚠️ DataFrame vacío: {name}")
+        return
+
+    dataset = Path(folder) / name.replace("/", "_")
+    tiene_clave = key in df.columns
+    if tiene_clave:
+        df, ids = _claves_validas(logger, df, key, name)
+
+    if not full_load and dataset.exists():
+        shutil.rmtree(dataset)
+    dataset.mkdir(parents=True, exist_ok=True)
+
+    indice = {}
+    if tiene_clave:
+        huellas = _huellas(df, key, version_col)
+        indice = leer_indice_parquet(dataset, key)
+        escribir = ids.map(indice) != huellas
+        df = df[escribir]
+        indice.update(dict(zip(ids[escribir], huellas[escribir])))
+
+    if df.empty:
+        logger.info(f"✅ Sin cambios en {dataset.name}")
+        return
+
+    ahora = datetime.now(timezone.utc)
+    particion = dataset / f"ingest_date={ahora:%Y-%m-%d}"
+    particion.mkdir(parents=True, exist_ok=True)
+    ruta = particion / f"part-{ahora:%H%M%S%f}.parquet"
+    tmp_path = ruta.with_suffix(".tmp")
+    pq.write_table(_a_tabla_arrow(aplicar_esquema(df.copy(), name)), tmp_path)
+    os.replace(tmp_path, ruta)
+
+    # Primero la parte y después el índice: un corte entre medias deja un
+    # índice desfasado, que leer_indice_parquet detecta
+    if tiene_clave:
+        guardar_indice_parquet(dataset, indice)
+    logger.info(f"✅ Guardado en Parquet: {ruta} ({len(df)} registros)")
+
+    if len(list(dataset.rglob("*.parquet"))) > MAX_PARTES:
+        compactar_parquet(logger, dataset, key)
+
+
+def compactar_parquet(logger, dataset: Path, key: str = "id") -> Path:
+    """
+    Reescribe un dataset raw Parquet como una sola parte con la última versión
+    de cada id y borra las anteriores, así read_raw no relee todo el historial
+    de ingestas. La parte nueva se escribe antes de borrar: si el proceso se
+    corta entre medias, las antiguas solo repiten versiones ya superadas.
+    """
+    dataset = Path(dataset)
+    partes = sorted(dataset.rglob("*.parquet"))
+    indice = leer_indice_parquet(dataset, key)
+    df = read_raw(dataset, key)
+
+    ahora = datetime.now(timezone.utc)
+    particion = dataset / f"ingest_date={ahora:%Y-%m-%d}"
+    particion.mkdir(parents=True, exist_ok=True)
+    ruta = particion / f"part-{ahora:%H%M%S%f}.parquet"
+    tmp_path = ruta.with_suffix(".tmp")
+    pq.write_table(_a_tabla_arrow(df), tmp_path)
+    os.replace(tmp_path, ruta)
+
+    for parte in partes:
+        parte.unlink()
+    for carpeta in dataset.glob("ingest_date=*"):
+        if not any(carpeta.iterdir()):
+            carpeta.rmdir()
+    if (dataset / "_index.json").exists():
+        guardar_indice_parquet(dataset, indice)
+    logger.info(f"🗜️ {dataset.name}: {len(partes)} partes compactadas en {ruta.name} ({len(df)} registros)")
+    return ruta
+
+
+def listar_raw(folder: Path = DATA_DIR) -> list:
+    """
+    Datasets disponibles en data/raw: carpetas Parquet y CSV.
+    Si un dataset existe en ambos formatos se usa el Parquet.
+    """
+    folder = Path(folder)
+    if not folder.exists():
+        return []
+    parquet = {p.name: p for p in folder.iterdir() if p.is_dir() and any(p.rglob("*.parquet"))}
+    csv = {p.stem: p for p in folder.glob("*.csv") if p.stem not in parquet}
+    return list(parquet.values()) + list(csv.values())
+
+
+def _opciones_csv(path: Path, nombre: str, columns: list = None) -> tuple:
+    """
+    (columnas, ConvertOptions) para leer un CSV raw con pyarrow: las columnas
+    declaradas en el esquema se leen como texto (aplicar_esquema las convierte)
+    y el resto se infiere; vacíos y marcadores de nulo quedan nulos.
+    """
+    cabecera = list(pd.read_csv(path, nrows=0).columns)
+    usecols = [c for c in cabecera if c in columns] if columns is not None else cabecera
+    opciones = pa_csv.ConvertOptions(
+        column_types={c: pa.string() for c in tipos(nombre, usecols)},
+        include_columns=usecols,
+        strings_can_be_null=True,
+    )
+    return usecols, opciones
+
+
+def leer_csv(path: Path, nombre: str = None, columns: list = None) -> pd.DataFrame:
+    """
+    Lee un CSV raw con pyarrow y los dtypes del registro de esquemas.
+    Si un valor no encaja en el tipo inferido se relee con el motor de pandas;
+    en ambos casos aplicar_esquema deja nulos los valores inválidos.
+    """
+    path = Path(path)
+    nombre = nombre or path.stem
+    usecols, opciones = _opciones_csv(path, nombre, columns)
+    try:
+        df = pa_csv.read_csv(path, convert_options=opciones).to_pandas()
+    except (ValueError, TypeError, pa.ArrowException):
+        df = pd.read_csv(path, usecols=usecols, low_memory=False)
+    return aplicar_esquema(df, nombre)
+
+
+def _bloques_csv(path: Path, chunk_rows: int, columns: list = None):
+    """
+    Bloques de chunk_rows filas de un CSV raw, leído en streaming con las
+    mismas opciones que leer_csv. Si un bloque posterior no encaja en los tipos
+    inferidos al inicio, continúa con el motor de pandas desde esa fila.
+    """
+    usecols, opciones = _opciones_csv(path, path.stem, columns)
+    emitidas = 0
+    pendientes = []
+    try:
+        lector = pa_csv.open_csv(path, convert_options=opciones)
+        for batch in lector:
+            pendientes.append(batch)
+            while sum(len(b) for b in pendientes) >= chunk_rows:
+                tabla = pa.Table.from_batches(pendientes)
+                pendientes = tabla.slice(chunk_rows).to_batches()
+                emitidas += chunk_rows
+                yield tabla.slice(0, chunk_rows).to_pandas()
+        if pendientes:
+            yield pa.Table.from_batches(pendientes).to_pandas()
+        return
+    except pa.ArrowInvalid:
+        pass
+
+    for chunk in pd.read_csv(
+        path,
+        usecols=usecols,
+        skiprows=range(1, emitidas + 1),
+        chunksize=chunk_rows,
+        low_memory=False,
+    ):
+        yield chunk.reset_index(drop=True)
+
+
+def read_raw(path: Path, key: str = "id", columns: list = None) -> pd.DataFrame:
+    """
+    Lee un dataset raw. Para Parquet recorre las particiones en orden de
+    ingesta y conserva la última versión de cada id; para CSV usa leer_csv.
+    En ambos casos las columnas declaradas salen con el dtype del esquema.
+    """
+    path = Path(path)
+    if not path.is_dir():
+        return leer_csv(path, columns=columns)
+
+    partes = sorted(path.rglob("*.parquet"))
+    frames = []
+    for parte in partes:
+        columnas = columns
+        if columns is not None:
+            nombres = pq.read_schema(parte).names
+            columnas = [c for c in columns if c in nombres]
+        frames.append(pq.read_table(parte, columns=columnas).to_pandas())
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    if key in df.columns and len(frames) > 1:
+        df = df.drop_duplicates(subset=[key], keep="last").reset_index(drop=True)
+    return aplicar_esquema(df, path.name)
+
+
+def iter_raw(path: Path, chunk_rows: int = CHUNK_ROWS, key: str = "id", columns: list = None):
+    """
+    Genera un dataset raw en bloques de hasta chunk_rows filas, con el dtype del
+    esquema. Para Parquet recorre las particiones de la más nueva a la más
+    antigua y descarta ids ya vistos (misma última versión por id que read_raw).
+    """
+    path = Path(path)
+    if not path.is_dir():
+        for chunk in _bloques_csv(path, chunk_rows, columns):
+            yield aplicar_esquema(chunk, path.stem)
+        return
+
+    vistos = set()
+    for parte in sorted(path.rglob("*.parquet"), reverse=True):
+        archivo = pq.ParquetFile(parte)
+        columnas = None
+        if columns is not None:
+            columnas = [c for c in columns if c in archivo.schema_arrow.names]
+            if key in archivo.schema_arrow.names and key not in columnas:
+                columnas.append(key)
+        for batch in archivo.iter_batches(batch_size=chunk_rows, columns=columnas):
+            df = batch.to_pandas()
+            if key in df.columns:
+                df = df[~df[key].isin(vistos)]
+                vistos.update(df[key].tolist())
+                if columns is not None and key not in columns:
+                    df = df.drop(columns=[key])
+            if not df.empty:
+                yield aplicar_esquema(df.reset_index(drop=True), path.name)
+
+
+def ruta_raw(name: str, folder: Path = DATA_DIR) -> Path:
+    """Ruta del dataset raw (carpeta Parquet si existe, si no el CSV) o None."""
+    nombre = name.replace("/", "_")
+    dataset = Path(folder) / nombre
+    if dataset.is_dir() and any(dataset.rglob("*.parquet")):
+        return dataset
+    csv = Path(folder) / f"{nombre}.csv"
+    return csv if csv.exists() else None
+
+
+def load_to_csv(
+    logger,
+    df: pd.DataFrame,
+    name: str,
+    folder: Path = DATA_DIR,
+    full_load: bool = True,
+    key: str = "id",
+    version_col: str = None,
+):
+    """
+    Guarda un DataFrame en formato CSV dentro de la carpeta de process.
+    Con full_load=True fusiona con el CSV existente por clave (upsert_csv);
+    con full_load=False lo sobrescribe.
+    Si RAW_FORMAT=parquet delega en load_to_parquet.
+    """
+    if formato_raw() == "parquet":
+        return load_to_parquet(logger, df, name, folder, full_load, key, version_col)
+
+    if df is None or df.empty:
+        logger.info(f"⚠️ DataFrame vacío: {name}")
+        return
+
+    Path(folder).mkdir(parents=True, exist_ok=True)
+    file_path = Path(folder) / f"{name.replace('/', '_')}.csv"
+
+    if full_load and file_path.exists():
+        if key in df.columns:
+            upsert_csv(logger, df, file_path, key=key, version_col=version_col)
+            return
+        # Sin clave: fusión completa como antes
+        existing_df = leer_csv(file_path, name)
+        df = pd.concat([existing_df, df], ignore_index=True)
+        df = df.drop_duplicates(keep='last').reset_index(drop=True)
+
+    if key in df.columns:
+        df, ids = _claves_validas(logger, df, key, name)
+    df.to_csv(file_path, index=False, encoding="utf-8-sig")
+    if key in df.columns:
+        guardar_indice(file_path, dict(zip(ids, _huellas(df, key, version_col))))
+    logger.info(f"✅ Guardado en CSV: {file_path} ({len(df)} registros)")
@@ -0,0 +1,91 @@
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+class RateLimiter:
+    """
+    Token bucket compartido entre hilos con control AIMD:
+    - cada respuesta correcta suma al ritmo (aumento aditivo),
+    - cada 429/503 lo divide (disminución multiplicativa) y, si llega
+      Retry-After, pausa a todos los hilos hasta que venza.
+    El ritmo (peticiones por segundo) se ajusta así al límite real de la API.
+    """
+
+    def __init__(
+        self,
+        rate: float = 2.5,
+        min_rate: float = 0.2,
+        max_rate: float = 20.0,
+        incremento: float = 0.5,
+        factor: float = 0.5,
+    ):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.incremento = incremento
+        self.factor = factor
+
+        self._tokens = 1.0
+        self._ultimo = time.monotonic()
+        self._pausa_hasta = 0.0
+        self._lock = threading.Lock()
+
+    def _rellenar(self, ahora: float):
+        capacidad = max(1.0, self.rate)
+        self._tokens = min(capacidad, self._tokens + (ahora - self._ultimo) * self.rate)
+        self._ultimo = ahora
+
+    def acquire(self):
+        """Bloquea hasta que haya un token disponible."""
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                if ahora < self._pausa_hasta:
+                    espera = self._pausa_hasta - ahora
+                else:
+                    self._rellenar(ahora)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    espera = (1 - self._tokens) / self.rate
+            time.sleep(espera)
+
+    def on_success(self):
+        """Aumento aditivo: ~+incremento req/s por cada segundo sin errores."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.incremento / self.rate)
+
+    def on_throttle(self, retry_after: float = None):
+        """Disminución multiplicativa y pausa global opcional (Retry-After)."""
+        with self._lock:
+            ahora = time.monotonic()
+            self._rellenar(ahora)
+            self.rate = max(self.min_rate, self.rate * self.factor)
+            self._tokens = 0.0
+            if retry_after:
+                self._pausa_hasta = max(self._pausa_hasta, ahora + retry_after)
+
+
+def parse_retry_after(valor: str) -> float:
+    """Convierte la cabecera Retry-After (segundos o fecha HTTP) a segundos."""
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        fecha = parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return None
+    if fecha.tzinfo is None:
+        fecha = fecha.replace(tzinfo=timezone.utc)
+    return max(0.0, (fecha - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_jitter(intento: int, base: float = 1.0, maximo: float = 60.0) -> float:
+    """Espera exponencial con jitter completo para el intento indicado (0, 1, 2...)."""
+    return random.uniform(0, min(maximo, base * 2**intento))
@@ -0,0 +1,258 @@
+# src/extract/schemas.py
+"""
+Registro de esquemas por dataset de data/raw.
+
+Cada dataset declara:
+- "tipos": dtype de pandas por columna (ints nulables, categóricas para campos
+  de baja cardinalidad, texto para ids, teléfonos y fechas).
+- "fecha_hora": columnas que Transform separa en <col>_fecha y <col>_hora.
+- "ids_url": columnas con una URL de la API de las que Transform conserva el
+  id (Int64).
+- "ids_lista": columnas con listas de URLs de la API (related_deals…); Transform
+  las deja siempre como texto con los ids separados por comas, aunque todas
+  las listas vengan vacías.
+
+Las columnas que no estén declaradas se siguen infiriendo al leer.
+"""
+import pandas as pd
+
+# Las fechas se leen como texto; Transform las convierte con to_datetime
+FECHA = "string"
+
+ESQUEMAS = {
+    "contacts": {
+        "tipos": {
+            "id": "Int64",
+            "owner": "string",
+            "owner_name": "string",
+            "first_name": "string",
+            "last_name": "string",
+            "status": "category",
+            "title": "string",
+            "company": "string",
+            "company_name": "string",
+            "taxpayer_identification_number": "string",
+            "medium": "category",
+            "channel": "category",
+            "picture_url": "string",
+            "contact_source.name": "category",
+            "gdpr_accept": "boolean",
+            "disclaimer": "boolean",
+            "created": FECHA,
+            "modified": FECHA,
+            "last_contact": FECHA,
+            "birthday": FECHA,
+            "gdpr_acceptance_date": FECHA,
+            "gdpr_revoke_date": FECHA,
+        },
+    },
+    "companies": {
+        "tipos": {
+            "id": "Int64",
+            "name": "string",
+            "company_sector": "category",
+            "number_of_employees": "Int64",
+            "number_of_employees_desc": "category",
+            "owner": "string",
+            "owner_name": "string",
+            "taxpayer_identification_number": "string",
+            "last_viewed": FECHA,
+            "last_interaction": FECHA,
+            "created": FECHA,
+            "modified": FECHA,
+        },
+        "fecha_hora": ["last_viewed", "last_interaction", "created", "modified"],
+    },
+    "deals": {
+        "tipos": {
+            "id": "Int64",
+            "owner_name": "string",
+            "name": "string",
+            "contact": "string",
+            "contact_name": "string",
+            "contact_email": "string",
+            "contact_phone": "string",
+            "contact_medium": "category",
+            "contact_source": "category",
+            "company": "string",
+            "company_name": "string",
+            "amount": "Float64",
+            "amount_user": "Float64",
+            "currency": "category",
+            "status": "Int64",
+            "status_desc": "category",
+            "probability": "Int64",
+            "probability_desc": "category",
+            "pipeline": "string",
+            "pipeline_stage": "string",
+            "pipeline_desc": "category",
+            "pipeline_stage_desc": "category",
+            "deal_source": "category",
+            "created": FECHA,
+            "modified": FECHA,
+            "created_at": FECHA,
+            "modified_at": FECHA,
+            "expected_closed_date": FECHA,
+            "actual_closed_date": FECHA,
+        },
+        "fecha_hora": ["created_at", "modified_at", "close_date"],
+        "ids_url": ["contact", "company"],
+    },
+    "calls": {
+        "tipos": {
+            "id": "Int64",
+            "owner": "string",
+            "content_object": "string",
+            "type": "category",
+            "comment": "string",
+            "outcome": "category",
+            "audio_url": "string",
+            "duration": "Float64",
+            "content_type_model": "category",
+            "content_object_id": "Int64",
+            "integration_id": "string",
+            "related_companies": "string",
+            "related_deals": "string",
+            "related_contacts": "string",
+            "created": FECHA,
+            "register_date": FECHA,
+            "modified_at": FECHA,
+            "call_time": FECHA,
+        },
+        "fecha_hora": ["register_date", "modified_at", "call_time"],
+        "ids_url": ["audio_url", "integration_id"],
+        "ids_lista": ["related_companies", "related_deals", "related_contacts"],
+    },
+    "tasks": {
+        "tipos": {
+            "id": "Int64",
+            "owner": "string",
+            "owner_name": "string",
+            "owner_id": "Int64",
+            "assigned_to": "string",
+            "assigned_to_name": "string",
+            "assigned_to_id": "Int64",
+            "name": "string",
+            "description": "string",
+            "remarks": "string",
+            "duration": "Int64",
+            "type": "Int64",
+            "status": "Int64",
+            "status_desc": "category",
+            "deals": "string",
+            "task_type": "string",
+            "task_stage": "string",
+            "related_companies": "string",
+            "start_datetime": FECHA,
+            "end_datetime": FECHA,
+            "due_date": FECHA,
+            "created_at": FECHA,
+            "created": FECHA,
+            "modified": FECHA,
+            "completed_date": FECHA,
+        },
+        "fecha_hora": [
+            "start_datetime",
+            "end_datetime",
+            "due_date",
+            "created_at",
+            "created",
+            "modified",
+            "completed_date",
+        ],
+        "ids_url": ["deals", "task_type", "task_stage"],
+        "ids_lista": ["related_companies"],
+    },
+    "users": {
+        "tipos": {
+            "id": "Int64",
+            "username": "string",
+            "first_name": "string",
+            "last_name": "string",
+            "country": "category",
+            "phone": "string",
+            "picture": "string",
+            "online_status": "category",
+            "full_name": "string",
+            "is_company_admin": "boolean",
+            "company": "string",
+            "inbox_user": "boolean",
+            "is_tester": "boolean",
+        },
+    },
+    "deal_times": {
+        "tipos": {
+            "id": "Int64",
+            "deal_id": "Int64",
+            "name": "string",
+            "modified": FECHA,
+        },
+    },
+    "deals_pipelines": {
+        "tipos": {
+            "id": "Int64",
+            "user_company": "string",
+            "name": "string",
+            "is_default": "boolean",
+            "user_default": "boolean",
+        },
+    },
+    "pipelines_stages": {
+        "tipos": {
+            "id": "Int64",
+            "pipeline": "string",
+            "pipeline_desc": "category",
+            "name": "string",
+            "position": "Int64",
+            "probability": "Int64",
+        },
+    },
+    "tasks_types": {
+        "tipos": {
+            "id": "Int64",
+            "name": "string",
+        },
+    },
+}
+
+
+def esquema(nombre: str) -> dict:
+    """Esquema del dataset (tasks/types → tasks_types) o {} si no está registrado."""
+    return ESQUEMAS.get(nombre.replace("/", "_").lower(), {})
+
+
+def tipos(nombre: str, columnas: list = None) -> dict:
+    """dtypes declarados del dataset, opcionalmente solo para columnas."""
+    declarados = esquema(nombre).get("tipos", {})
+    if columnas is None:
+        return dict(declarados)
+    return {c: t for c, t in declarados.items() if c in columnas}
+
+
+def columnas_por_regla(regla: str) -> dict:
+    """{dataset: columnas} de una regla de Transform ("fecha_hora", "ids_url", "ids_lista")."""
+    return {n: e[regla] for n, e in ESQUEMAS.items() if regla in e}
+
+
+def aplicar_esquema(df: pd.DataFrame, nombre: str) -> pd.DataFrame:
+    """
+    Convierte las columnas declaradas presentes en df a su dtype.
+    Los valores que no encajan en un tipo numérico o booleano quedan nulos.
+    """
+    for col, tipo in tipos(nombre, df.columns).items():
+        if str(df[col].dtype) == tipo:
+            continue
+        if tipo == "Int64":
+            numeros = pd.to_numeric(df[col], errors="coerce")
+            # Decimales (1.5) e infinitos no caben en un entero: quedan nulos
+            df[col] = numeros.where(numeros % 1 == 0).astype(tipo)
+        elif tipo == "Float64":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(tipo)
+        elif tipo == "boolean":
+            texto = df[col].astype("string").str.lower()
+            df[col] = texto.map({"true": True, "false": False, "1": True, "0": False}).astype("boolean")
+        elif tipo == "category":
+            df[col] = df[col].astype("string").astype("category")
+        else:
+            df[col] = df[col].astype(tipo)
+    return df
@@ -0,0 +1,112 @@
+import json
+import warnings
+from pathlib import Path
+
+import pandas as pd
+
+root = Path(__file__).resolve().parent.parent.parent
+
+# Carpeta de trabajo para la extracción en streaming
+TMP_DIR = root / "data" / "tmp"
+
+
+class NDJSONSink:
+    """
+    Destino en disco para la extracción en streaming.
+    Cada página se añade como líneas NDJSON (un registro por línea) en cuanto
+    llega, así la memoria no crece con el tamaño del endpoint. Al leer, los
+    registros se normalizan por bloques con pd.json_normalize (iter_frames).
+    """
+
+    def __init__(self, nombre: str, folder: Path = None):
+        folder = Path(folder or TMP_DIR)
+        folder.mkdir(parents=True, exist_ok=True)
+        self.path = folder / f"{nombre.replace('/', '_')}.ndjson"
+        self.state_path = self.path.with_suffix(".state.json")
+        self.rows = 0
+
+    def reset(self):
+        """Vacía el archivo (nueva extracción desde la primera página)."""
+        self.path.write_text("", encoding="utf-8")
+        self.state_path.unlink(missing_ok=True)
+        self.rows = 0
+
+    # ---- Estado para reanudar ---- #
+    def guardar_estado(self, pagina: int, firma: dict):
+        """
+        Registra la última página completa escrita y el tamaño del archivo en ese
+        punto. firma identifica la consulta (params, page_size) para no mezclar
+        páginas de ejecuciones distintas.
+        """
+        estado = {
+            "ultima_pagina": pagina,
+            "offset": self.path.stat().st_size,
+            "rows": self.rows,
+            "firma": firma,
+        }
+        tmp = self.state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(estado), encoding="utf-8")
+        tmp.replace(self.state_path)
+
+    def reanudar(self, firma: dict) -> int:
+        """
+        Si hay un estado guardado para la misma consulta, recorta el archivo a la
+        última página completa y devuelve la página siguiente; si no, vacía el
+        archivo y devuelve 1.
+        """
+        try:
+            estado = json.loads(self.state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            estado = None
+
+        if not estado or estado.get("firma") != firma or not self.path.exists():
+            self.reset()
+            return 1
+
+        # Descarta líneas escritas después del último estado (página a medias)
+        with open(self.path, "r+b") as f:
+            f.truncate(estado["offset"])
+        self.rows = estado["rows"]
+        return estado["ultima_pagina"] + 1
+
+    def write_page(self, results: list):
+        """Añade una página al final del archivo."""
+        with open(self.path, "a", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps(r, ensure_ascii=False))
+                f.write("\n")
+        self.rows += len(results)
+
+    def iter_frames(self, chunk_rows: int = 50000):
+        """Genera DataFrames normalizados de hasta chunk_rows registros."""
+        if not self.path.exists():
+            return
+        bloque = []
+        with open(self.path, encoding="utf-8") as f:
+            for linea in f:
+                bloque.append(json.loads(linea))
+                if len(bloque) >= chunk_rows:
+                    yield pd.json_normalize(bloque)
+                    bloque = []
+        if bloque:
+            yield pd.json_normalize(bloque)
+
+    def to_frame(self, chunk_rows: int = 50000) -> pd.DataFrame:
+        """
+        DataFrame equivalente a pd.json_normalize sobre todos los registros.
+        infer_objects reconcilia columnas que en algún bloque eran solo nulos.
+        Carga el endpoint completo en memoria: para guardarlo usar iter_frames.
+        """
+        frames = list(self.iter_frames(chunk_rows))
+        if not frames:
+            return pd.DataFrame()
+        if len(frames) == 1:
+            return frames[0]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)
+            return pd.concat(frames, ignore_index=True, sort=False).infer_objects()
+
+    def cleanup(self):
+        """Elimina el archivo temporal y su estado."""
+        self.path.unlink(missing_ok=True)
+        self.state_path.unlink(missing_ok=True)
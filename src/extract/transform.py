@@ -1,6 +1,7 @@
 # ...existing code...
 import pandas as pd
-import ast
+
+from src.transform.utils import expand_stage_durations
 
 
 def normalize_dates(df: pd.DataFrame, date_columns: list[str] | None = None) -> pd.DataFrame:
@@ -61,36 +62,6 @@ def drop_empty_columns(df: pd.DataFrame, threshold: float = 0.9) -> pd.DataFrame
     return df.dropna(axis=1, thresh=int(len(df) * (1 - threshold)))
 
 
-def expand_stage_durations(
-    df: pd.DataFrame, id_col: str = "id", stages_col: str = "stages_duration"
-):
-    registros = []
-
-    for _, row in df[[id_col, stages_col]].iterrows():
-        id_value = row[id_col]
-
-        # Convertir string -> lista de diccionarios
-        try:
-            lista_stages = ast.literal_eval(row[stages_col])
-        except Exception:
-            continue
-
-        # Recorrer cada diccionario dentro de la lista
-        for item in lista_stages:
-            dur = item.get("stage_duration", {})
-            registros.append(
-                {
-                    "id": id_value,
-                    "stage_name": item.get("stage_name", None),
-                    "days": dur.get("days", None),
-                    "hours": dur.get("hours", None),
-                    "minutes": dur.get("minutes", None),
-                }
-            )
-
-    return pd.DataFrame(registros)
-
-
 def transform_dataset(df: pd.DataFrame, dataset_name: str) -> pd.DataFrame:
     """
     Aplica transformaciones específicas según el dataset.
@@ -1,7 +1,12 @@
 from pathlib import Path
 import json
+import threading
 
 CHECKPOINT_FILE = Path("config/checkpoints.json")
+# Último modified procesado por deal en deal_times ({deal_id: modified})
+DEAL_TIMES_SNAPSHOT = Path("config/deal_times_modified.json")
+
+_checkpoint_lock = threading.Lock()
 
 
 def read_checkpoints():
@@ -15,3 +20,24 @@ def write_checkpoints(data: dict):
     """Escribe el diccionario completo de checkpoints en disco."""
     CHECKPOINT_FILE.parent.mkdir(parents=True, exist_ok=True)
     CHECKPOINT_FILE.write_text(json.dumps(data, indent=2))
+
+
+def update_checkpoint(key: str, value: dict):
+    """Actualiza una sola entrada de checkpoints (seguro entre hilos)."""
+    with _checkpoint_lock:
+        data = read_checkpoints()
+        data[key] = value
+        write_checkpoints(data)
+
+
+def read_deal_times_snapshot() -> dict:
+    """Lee el último modified procesado por deal (claves str)."""
+    if DEAL_TIMES_SNAPSHOT.exists():
+        return json.loads(DEAL_TIMES_SNAPSHOT.read_text())
+    return {}
+
+
+def write_deal_times_snapshot(data: dict):
+    """Escribe el snapshot de modified por deal."""
+    DEAL_TIMES_SNAPSHOT.parent.mkdir(parents=True, exist_ok=True)
+    DEAL_TIMES_SNAPSHOT.write_text(json.dumps(data))
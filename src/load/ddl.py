@@ -0,0 +1,163 @@
+# src/load/ddl.py
+"""
+DDL de las tablas SQL a partir del esquema Arrow de los Parquet de data/stage.
+
+- Texto: NVARCHAR con la longitud máxima observada redondeada hacia arriba
+  (LONGITUDES); por encima de 4000, NVARCHAR(max). La longitud se mide en
+  unidades UTF-16, como NVARCHAR(n): un emoji cuenta 2.
+- Enteros: INT si los valores observados caben con holgura, si no BIGINT;
+  la clave (id) y las columnas con ids de otras tablas (*_id y las de la
+  regla ids_url del registro de esquemas) siempre son BIGINT, como id.
+- DECIMAL para columnas decimales de Arrow y las de COLUMNAS_DECIMAL.
+- DATE, TIME y DATETIME2 para las columnas Arrow date32, time64 y timestamp.
+- Clave primaria en id si es única en el archivo; si se repite, índice.
+"""
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import (
+    DECIMAL,
+    BigInteger,
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    MetaData,
+    PrimaryKeyConstraint,
+    Table,
+    Time,
+    Unicode,
+    UnicodeText,
+)
+from sqlalchemy.dialects import mssql
+
+from src.extract.schemas import columnas_por_regla
+
+# Longitudes de NVARCHAR (se usa la primera que cubre el máximo observado)
+LONGITUDES = (50, 100, 255, 500, 1000, 2000, 4000)
+
+# Los INT se usan solo si el máximo observado no supera la mitad del rango
+LIMITE_INT = (2**31 - 1) // 2
+
+# Columnas con ids de otras tablas (contact, company, related_deals…)
+COLUMNAS_ID = columnas_por_regla("ids_url")
+
+# Columnas monetarias que se guardan como DECIMAL(precisión, escala)
+COLUMNAS_DECIMAL = {
+    "deals": {"amount": (18, 2), "amount_user": (18, 2)},
+}
+
+# Filas por lote al recorrer el Parquet para medir las columnas
+BATCH_PERFIL = 65536
+
+# Caracteres fuera del plano básico: ocupan dos unidades UTF-16 (par sustituto)
+_FUERA_BMP = r"[\x{10000}-\x{10FFFF}]"
+
+
+def longitud_utf16(columna: pa.Array) -> pa.Array:
+    """Longitud de cada texto en unidades UTF-16 (la que cuenta NVARCHAR)."""
+    return pc.add(pc.utf8_length(columna), pc.count_substring_regex(columna, _FUERA_BMP))
+
+
+def perfil_parquet(file_path, clave: str = "id") -> dict:
+    """
+    Recorre el Parquet por lotes y devuelve el esquema Arrow y, por columna, la
+    longitud máxima en UTF-16 (texto) o el mayor valor absoluto (enteros);
+    también si la clave es única.
+    """
+    archivo = pq.ParquetFile(file_path)
+    esquema = archivo.schema_arrow
+    perfil = {nombre: 0 for nombre in esquema.names}
+    for batch in archivo.iter_batches(batch_size=BATCH_PERFIL):
+        for nombre, columna in zip(batch.schema.names, batch.columns):
+            if pa.types.is_dictionary(columna.type):
+                columna = columna.dictionary
+            tipo = columna.type
+            if pa.types.is_string(tipo) or pa.types.is_large_string(tipo):
+                valor = pc.max(longitud_utf16(columna)).as_py()
+            elif pa.types.is_integer(tipo):
+                extremos = pc.min_max(columna)
+                valor = max(abs(extremos["min"].as_py() or 0), abs(extremos["max"].as_py() or 0))
+            else:
+                continue
+            perfil[nombre] = max(perfil[nombre], valor or 0)
+
+    clave_unica = False
+    if clave in esquema.names:
+        ids = archivo.read(columns=[clave]).column(clave)
+        # Ordenar y comparar vecinos usa mucha menos memoria que count_distinct
+        ordenados = pc.take(ids, pc.sort_indices(ids)).combine_chunks()
+        repetidos = len(ids) > 1 and pc.any(pc.equal(ordenados[1:], ordenados[:-1])).as_py()
+        clave_unica = ids.null_count == 0 and not repetidos
+    return {"esquema": esquema, "maximos": perfil, "clave_unica": clave_unica}
+
+
+def longitud_nvarchar(maximo: int):
+    """Longitud de NVARCHAR para el máximo observado (None = NVARCHAR(max))."""
+    for longitud in LONGITUDES:
+        if maximo <= longitud:
+            return longitud
+    return None
+
+
+def _es_id(tabla: str, columna: str, clave: str) -> bool:
+    """True para la clave y las columnas que referencian ids de otras tablas."""
+    return columna == clave or columna.endswith("_id") or columna in COLUMNAS_ID.get(tabla, [])
+
+
+def tipo_columna(tabla: str, campo: pa.Field, maximo: int, clave: str = "id"):
+    """Tipo de SQLAlchemy para un campo Arrow del Parquet de data/stage."""
+    tipo = campo.type
+    if pa.types.is_dictionary(tipo):
+        tipo = tipo.value_type
+
+    if campo.name in COLUMNAS_DECIMAL.get(tabla, {}):
+        return DECIMAL(*COLUMNAS_DECIMAL[tabla][campo.name])
+    if pa.types.is_decimal(tipo):
+        return DECIMAL(tipo.precision, tipo.scale)
+    if pa.types.is_boolean(tipo):
+        return Boolean()
+    if pa.types.is_integer(tipo):
+        if _es_id(tabla, campo.name, clave) or maximo > LIMITE_INT:
+            return BigInteger()
+        return Integer()
+    if pa.types.is_floating(tipo):
+        return Float()
+    if pa.types.is_date(tipo):
+        return Date().with_variant(mssql.DATE(), "mssql")
+    if pa.types.is_time(tipo):
+        return Time().with_variant(mssql.TIME(), "mssql")
+    if pa.types.is_timestamp(tipo):
+        return DateTime().with_variant(mssql.DATETIME2(), "mssql")
+    longitud = longitud_nvarchar(maximo)
+    return Unicode(longitud) if longitud else UnicodeText()
+
+
+def definir_tabla(nombre: str, perfil: dict, clave: str = "id", columnstore: bool = False) -> Table:
+    """
+    Table de SQLAlchemy para el Parquet perfilado: clave primaria en clave si
+    es única (NONCLUSTERED si la tabla lleva columnstore) o índice si se repite.
+    """
+    esquema = perfil["esquema"]
+    unica = perfil["clave_unica"]
+    columnas = [
+        Column(
+            campo.name,
+            tipo_columna(nombre, campo, perfil["maximos"][campo.name], clave),
+            nullable=not (unica and campo.name == clave),
+            autoincrement=False,
+        )
+        for campo in esquema
+    ]
+    tabla = Table(nombre, MetaData(), *columnas)
+    if clave in esquema.names:
+        if unica:
+            tabla.append_constraint(
+                PrimaryKeyConstraint(clave, name=f"pk_{nombre}", mssql_clustered=not columnstore)
+            )
+        else:
+            Index(f"ix_{nombre}_{clave}", tabla.c[clave])
+    return tabla
@@ -1,10 +1,32 @@
-import pandas as pd
-from sqlalchemy import create_engine
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import BigInteger, Column, Integer, MetaData, String, Table, create_engine, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError, OperationalError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from pathlib import Path
 import dotenv
+import hashlib
+import json
 import os
+import time
 import urllib.parse
 import glob
 
+from src.extract.rate_limiter import backoff_jitter
+from src.load.ddl import definir_tabla, longitud_nvarchar, perfil_parquet, tipo_columna
+
+# Columna clave para el upsert de cada tabla
+CLAVE = "id"
+
+# Filas por lote (record batch) al leer el Parquet e insertar en SQL
+CHUNK_SIZE = 5000
+
+# Registro de cargas: {destino: {tabla: huella del Parquet cargado}}
+LEDGER_FILE = Path("config/load_ledger.json")
+
 
 def load_env_variables(logger):
     """Cargar variables de entorno necesarias para la conexión."""
@@ -14,11 +36,34 @@ def load_env_variables(logger):
         "server": os.getenv("DB_SERVER_IP"),
         "database": os.getenv("DB_DATABASE"),
         "username": os.getenv("DB_USERNAME"),
-        "password": os.getenv("DB_PASSWORD")
+        "password": os.getenv("DB_PASSWORD"),
+        # URL de SQLAlchemy alternativa (p. ej. sqlite:///data/local.db para pruebas)
+        "url": os.getenv("DB_URL"),
+        # merge (upsert por id) o replace (recrear la tabla con to_sql)
+        "mode": os.getenv("LOAD_MODE", "merge").lower(),
+        # Con merge, borrar las filas cuyo id ya no está en data/stage
+        "delete": os.getenv("LOAD_DELETE", "0").lower() in ("1", "true", "si", "sí"),
+        # Tablas que se cargan a la vez (conexiones del pool) y reintentos por tabla
+        "workers": max(1, int(os.getenv("LOAD_WORKERS", "4"))),
+        "retries": max(0, int(os.getenv("LOAD_RETRIES", "2"))),
+        # Tablas (separadas por comas) con índice columnstore agrupado en SQL Server
+        "columnstore": {t.strip() for t in os.getenv("LOAD_COLUMNSTORE", "").split(",") if t.strip()},
     }
 
 def create_db_engine(db_config):
-    """Crear un engine de SQLAlchemy para SQL Server usando pyodbc."""
+    """
+    Crear un engine de SQLAlchemy para SQL Server usando pyodbc (o DB_URL si
+    está definida), con un pool de una conexión por tabla en paralelo.
+    """
+    pool = {
+        "pool_size": db_config.get("workers", 1),
+        "max_overflow": 0,
+        "pool_pre_ping": True,
+    }
+    if db_config.get("url"):
+        if db_config["url"].startswith("sqlite"):
+            return create_engine(db_config["url"])
+        return create_engine(db_config["url"], **pool)
     params = urllib.parse.quote_plus(
         f"DRIVER={{ODBC Driver 18 for SQL Server}};"
         f"SERVER={db_config['server']},1433;"
@@ -27,35 +72,424 @@ def create_db_engine(db_config):
         f"PWD={db_config['password']};"
         "Encrypt=no;"  # Cambiar a 'yes' si tu SQL Server usa TLS
     )
-    engine = create_engine(f"mssql+pyodbc:///?odbc_connect={params}", fast_executemany=True)
+    engine = create_engine(
+        f"mssql+pyodbc:///?odbc_connect={params}", fast_executemany=True, **pool
+    )
     return engine
 
 def get_parquet_files(path_pattern):
     """Obtener todos los archivos parquet de una carpeta específica."""
     return glob.glob(path_pattern)
 
-def load_parquet_to_sql(file_path, engine, logger):
-    """Leer un archivo parquet y cargarlo como tabla SQL con el mismo nombre."""
-    df = pd.read_parquet(file_path)
+def load_parquet_to_sql(file_path, engine, logger, columnstore: bool = False, clave: str = CLAVE):
+    """
+    Leer un archivo parquet y cargarlo como tabla SQL con el mismo nombre:
+    recrea la tabla con la DDL derivada del Parquet (src/load/ddl.py) e
+    inserta las filas por lotes, en una sola transacción.
+    """
     table_name = os.path.splitext(os.path.basename(file_path))[0]  # Nombre sin extensión
-    df.to_sql(
-        table_name,
-        engine,
-        if_exists="replace",
-        index=False,
-        chunksize=5000
+    perfil = perfil_parquet(file_path, clave)
+    with engine.begin() as conn:
+        Table(table_name, MetaData()).drop(conn, checkfirst=True)
+        tabla = crear_tabla(conn, table_name, perfil, clave, logger, columnstore)
+        filas = insertar_lotes(conn, tabla, file_path)
+    logger.info(f"Tabla '{table_name}' cargada correctamente ({filas} filas).")
+
+
+# =============================
+# CARGA INCREMENTAL (MERGE)
+# =============================
+
+
+def _registros(batch: pa.RecordBatch) -> list:
+    """Filas del lote como dicts con tipos de Python y None como nulo."""
+    columnas = []
+    for columna in batch.columns:
+        if pa.types.is_timestamp(columna.type) and columna.type.tz:
+            # Las columnas DATETIME de SQL no guardan zona: se cargan en UTC
+            columna = columna.cast(pa.timestamp(columna.type.unit))
+        elif pa.types.is_floating(columna.type):
+            columna = pc.if_else(pc.is_nan(columna), pa.scalar(None, columna.type), columna)
+        columnas.append(columna)
+    return pa.RecordBatch.from_arrays(columnas, names=batch.schema.names).to_pylist()
+
+
+def crear_tabla(conn, nombre: str, perfil: dict, clave: str, logger, columnstore: bool = False) -> Table:
+    """
+    Crea la tabla con la DDL derivada del Parquet. Con columnstore=True en
+    SQL Server añade un índice columnstore agrupado (tablas de hechos).
+    """
+    tabla = definir_tabla(nombre, perfil, clave, columnstore)
+    tabla.create(conn)
+    if columnstore and conn.dialect.name == "mssql":
+        quote = conn.dialect.identifier_preparer.quote
+        conn.execute(
+            text(f"CREATE CLUSTERED COLUMNSTORE INDEX {quote(f'cci_{nombre}')} ON {quote(nombre)}")
+        )
+    tipos = ", ".join(f"{c.name} {c.type.compile(dialect=conn.dialect)}" for c in tabla.columns)
+    logger.info(f"🆕 Tabla '{nombre}' creada: {tipos}")
+    return tabla
+
+
+def preparar_tabla(conn, nombre: str, perfil: dict, clave: str, logger, columnstore: bool = False) -> Table:
+    """
+    Devuelve la tabla destino. Si no existe se crea con crear_tabla; si existe
+    se añaden las columnas nuevas del Parquet y, en SQL Server, se amplían los
+    NVARCHAR que se quedaron cortos para los valores nuevos. Los INT cuyos
+    valores ya piden BIGINT (mismo criterio que la DDL) pasan a BIGINT, y las
+    columnas enteras que ahora llegan como texto pasan a NVARCHAR.
+    En SQLite/DuckDB asegura un índice único en clave (lo exige ON CONFLICT).
+    """
+    if not inspect(conn).has_table(nombre):
+        crear_tabla(conn, nombre, perfil, clave, logger, columnstore)
+        return Table(nombre, MetaData(), autoload_with=conn)
+
+    destino = Table(nombre, MetaData(), autoload_with=conn)
+    quote = conn.dialect.identifier_preparer.quote
+    for campo in perfil["esquema"]:
+        maximo = perfil["maximos"][campo.name]
+        if campo.name not in destino.columns:
+            tipo = tipo_columna(nombre, campo, maximo, clave).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {quote(nombre)} ADD {quote(campo.name)} {tipo}"))
+            logger.info(f"➕ Columna '{campo.name}' añadida a '{nombre}' ({tipo})")
+            continue
+        actual = destino.c[campo.name].type
+        longitud = getattr(actual, "length", None)
+        if conn.dialect.name == "mssql" and longitud and maximo > longitud:
+            nueva = longitud_nvarchar(maximo)
+            tipo = f"NVARCHAR({nueva or 'max'})"
+            conn.execute(text(f"ALTER TABLE {quote(nombre)} ALTER COLUMN {quote(campo.name)} {tipo}"))
+            logger.info(f"↔ Columna '{campo.name}' de '{nombre}' ampliada a {tipo}")
+        elif (
+            isinstance(actual, Integer)
+            and isinstance(nuevo := tipo_columna(nombre, campo, maximo, clave), String)
+            and conn.dialect.name != "sqlite"  # SQLite guarda el texto tal cual
+        ):
+            # Columna creada como entero que ahora llega como texto (p. ej. una
+            # lista de ids de ids_lista cargada antes como BIGINT)
+            tipo = nuevo.compile(dialect=conn.dialect)
+            if conn.dialect.name != "mssql":
+                tipo = f"TYPE {tipo}"
+            conn.execute(text(f"ALTER TABLE {quote(nombre)} ALTER COLUMN {quote(campo.name)} {tipo}"))
+            logger.info(f"↔ Columna '{campo.name}' de '{nombre}' pasa de entero a texto ({tipo})")
+        elif (
+            isinstance(actual, Integer)
+            and not isinstance(actual, BigInteger)
+            and isinstance(tipo_columna(nombre, campo, maximo, clave), BigInteger)
+            and conn.dialect.name != "sqlite"  # INTEGER de SQLite ya es de 64 bits
+        ):
+            # INT que se acerca a su límite (mismo criterio que la DDL) → BIGINT
+            tipo = "BIGINT" if conn.dialect.name == "mssql" else "TYPE BIGINT"
+            conn.execute(text(f"ALTER TABLE {quote(nombre)} ALTER COLUMN {quote(campo.name)} {tipo}"))
+            logger.info(f"↔ Columna '{campo.name}' de '{nombre}' ampliada a BIGINT")
+    if conn.dialect.name != "mssql" and perfil["clave_unica"] and not destino.primary_key.columns:
+        conn.execute(
+            text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {quote(f'ux_{nombre}_{clave}')} "
+                f"ON {quote(nombre)} ({quote(clave)})"
+            )
+        )
+    return Table(nombre, MetaData(), autoload_with=conn)
+
+
+def crear_staging(conn, destino: Table, columnas: list, prefijo: str = "stg") -> Table:
+    """Tabla temporal con las columnas (y tipos) de destino: #stg_<tabla> en SQL Server."""
+    if conn.dialect.name == "mssql":
+        nombre, prefijos = f"#{prefijo}_{destino.name}", []
+    else:
+        nombre, prefijos = f"{prefijo}_{destino.name}", ["TEMPORARY"]
+    staging = Table(
+        nombre,
+        MetaData(),
+        *[Column(col, destino.c[col].type) for col in columnas],
+        prefixes=prefijos,
     )
-    logger.info(f"Tabla '{table_name}' cargada correctamente.")
+    staging.drop(conn, checkfirst=True)
+    staging.create(conn)
+    return staging
+
+
+def insertar_lotes(conn, tabla: Table, file_path, chunksize: int = CHUNK_SIZE) -> int:
+    """
+    Inserta el Parquet en tabla leyendo record batches de chunksize filas
+    (executemany; fast_executemany en pyodbc). Solo un lote pasa a objetos de
+    Python a la vez, así la memoria no depende del tamaño de la tabla.
+    Devuelve las filas insertadas.
+    """
+    filas = 0
+    archivo = pq.ParquetFile(file_path)
+    columnas = [c.name for c in tabla.columns]
+    for batch in archivo.iter_batches(batch_size=chunksize, columns=columnas):
+        if batch.num_rows:
+            conn.execute(tabla.insert(), _registros(batch))
+            filas += batch.num_rows
+    return filas
+
+
+def _sql_merge(conn, destino: Table, staging: Table, columnas: list, clave: str, eliminar: bool) -> str:
+    """
+    Sentencia de upsert de staging sobre destino. Solo actualiza las filas en
+    las que algún valor cambió (comparación que trata NULL = NULL).
+    """
+    q = conn.dialect.identifier_preparer.quote
+    t, s = q(destino.name), q(staging.name)
+    valores = [c for c in columnas if c != clave]
+    lista = ", ".join(q(c) for c in columnas)
+
+    if conn.dialect.name == "mssql":
+        cambios = (
+            f"EXISTS (SELECT {', '.join(f's.{q(c)}' for c in valores)} "
+            f"EXCEPT SELECT {', '.join(f't.{q(c)}' for c in valores)})"
+        )
+        sentencia = f"MERGE INTO {t} AS t USING {s} AS s ON t.{q(clave)} = s.{q(clave)}\n"
+        if valores:
+            sentencia += (
+                f"WHEN MATCHED AND {cambios} THEN UPDATE SET "
+                + ", ".join(f"t.{q(c)} = s.{q(c)}" for c in valores)
+                + "\n"
+            )
+        sentencia += (
+            f"WHEN NOT MATCHED BY TARGET THEN INSERT ({lista}) "
+            f"VALUES ({', '.join(f's.{q(c)}' for c in columnas)})\n"
+        )
+        if eliminar:
+            sentencia += "WHEN NOT MATCHED BY SOURCE THEN DELETE\n"
+        return sentencia + ";"
+
+    # SQLite / DuckDB / PostgreSQL: INSERT ... ON CONFLICT
+    distinto = "IS NOT" if conn.dialect.name == "sqlite" else "IS DISTINCT FROM"
+    sentencia = f"INSERT INTO {t} ({lista}) SELECT {lista} FROM {s} WHERE true ON CONFLICT ({q(clave)}) "
+    if not valores:
+        return sentencia + "DO NOTHING"
+    return (
+        sentencia
+        + "DO UPDATE SET "
+        + ", ".join(f"{q(c)} = excluded.{q(c)}" for c in valores)
+        + " WHERE "
+        + " OR ".join(f"{t}.{q(c)} {distinto} excluded.{q(c)}" for c in valores)
+    )
+
+
+def _sql_claves_cambiadas(conn, destino: Table, staging: Table, claves: Table, columnas: list, clave: str) -> str:
+    """
+    INSERT en claves de cada clave de staging cuyo conjunto de filas difiere del
+    de destino (filas nuevas, cambiadas o que sobran), comparando con EXCEPT.
+    """
+    q = conn.dialect.identifier_preparer.quote
+    t, s, k = q(destino.name), q(staging.name), q(clave)
+    lista = ", ".join(q(c) for c in columnas)
+    return (
+        f"INSERT INTO {q(claves.name)} ({k}) "
+        f"SELECT {k} FROM (SELECT {lista} FROM {s} EXCEPT SELECT {lista} FROM {t}) AS nuevas "
+        f"UNION SELECT {k} FROM (SELECT {lista} FROM {t} WHERE {k} IN (SELECT {k} FROM {s}) "
+        f"EXCEPT SELECT {lista} FROM {s}) AS sobrantes"
+    )
+
+
+def _sql_eliminar(conn, destino: Table, staging: Table, clave: str, presentes: bool) -> str:
+    """DELETE de las filas de destino cuya clave está (o no está) en staging."""
+    q = conn.dialect.identifier_preparer.quote
+    t, s = q(destino.name), q(staging.name)
+    condicion = "EXISTS" if presentes else "NOT EXISTS"
+    return (
+        f"DELETE FROM {t} WHERE {condicion} "
+        f"(SELECT 1 FROM {s} WHERE {s}.{q(clave)} = {t}.{q(clave)})"
+    )
+
+
+def merge_parquet_to_sql(
+    file_path, engine, logger, eliminar: bool = False, clave: str = CLAVE, columnstore: bool = False
+):
+    """
+    Carga incremental de un Parquet de data/stage en la tabla del mismo nombre:
+    inserta el archivo por lotes en una tabla temporal de staging y aplica un
+    MERGE (SQL Server) o INSERT ... ON CONFLICT (SQLite/DuckDB) por clave.
+    Con eliminar=True borra las filas cuya clave ya no está en el archivo.
+    Si la clave se repite (p. ej. deal_times, una fila por etapa) se reemplazan
+    (DELETE + INSERT) solo las filas de las claves cuyo contenido cambió.
+    Todo ocurre en una transacción por tabla.
+    """
+    table_name = os.path.splitext(os.path.basename(file_path))[0]
+    perfil = perfil_parquet(file_path, clave)
+    columnas = perfil["esquema"].names
+    if clave not in columnas:
+        logger.warning(f"⚠ '{table_name}' no tiene columna '{clave}': se carga con replace")
+        return load_parquet_to_sql(file_path, engine, logger, columnstore)
+
+    with engine.begin() as conn:
+        destino = preparar_tabla(conn, table_name, perfil, clave, logger, columnstore)
+        staging = crear_staging(conn, destino, columnas)
+        filas = insertar_lotes(conn, staging, file_path)
 
-def ejecucion_carga(logger):
+        if not perfil["clave_unica"]:
+            if eliminar:
+                conn.execute(text(_sql_eliminar(conn, destino, staging, clave, presentes=False)))
+            claves = crear_staging(conn, destino, [clave], prefijo="chg")
+            conn.execute(text(_sql_claves_cambiadas(conn, destino, staging, claves, columnas, clave)))
+            conn.execute(text(_sql_eliminar(conn, destino, claves, clave, presentes=True)))
+            resultado = conn.execute(
+                destino.insert().from_select(
+                    columnas,
+                    staging.select().where(staging.c[clave].in_(claves.select())),
+                )
+            )
+            claves.drop(conn)
+            detalle = f"{resultado.rowcount} filas reemplazadas por '{clave}'"
+        else:
+            resultado = conn.execute(text(_sql_merge(conn, destino, staging, columnas, clave, eliminar)))
+            detalle = f"{resultado.rowcount} filas insertadas/actualizadas"
+            if eliminar and conn.dialect.name != "mssql":
+                borradas = conn.execute(text(_sql_eliminar(conn, destino, staging, clave, presentes=False)))
+                detalle += f", {borradas.rowcount} eliminadas"
+        staging.drop(conn)
+
+    logger.info(f"Tabla '{table_name}' actualizada ({filas} filas en stage, {detalle}).")
+
+
+# =============================
+# CARGA EN PARALELO
+# =============================
+
+
+def _reintentable(error: Exception) -> bool:
+    """Errores transitorios de la base de datos: conexión caída, timeout o deadlock."""
+    if isinstance(error, OperationalError):
+        return True
+    if isinstance(error, DBAPIError) and error.connection_invalidated:
+        return True
+    mensaje = str(error).lower()
+    return "deadlock" in mensaje or "40001" in mensaje or "database is locked" in mensaje
+
+
+def cargar_tabla(file_path, engine, logger, db_config) -> dict:
+    """
+    Carga un Parquet con reintentos (backoff + jitter) ante errores transitorios.
+    No propaga errores: devuelve tabla, ok, segundos, intentos y error.
+    """
+    table_name = os.path.splitext(os.path.basename(file_path))[0]
+    inicio = time.perf_counter()
+    error = None
+    for intento in range(db_config["retries"] + 1):
+        try:
+            columnstore = table_name in db_config["columnstore"]
+            if db_config["mode"] == "replace":
+                load_parquet_to_sql(file_path, engine, logger, columnstore)
+            else:
+                merge_parquet_to_sql(
+                    file_path, engine, logger, eliminar=db_config["delete"], columnstore=columnstore
+                )
+            error = None
+            break
+        except Exception as e:
+            error = e
+            if intento == db_config["retries"] or not _reintentable(e):
+                logger.error(f"❌ Error cargando '{table_name}': {e}")
+                break
+            espera = backoff_jitter(intento)
+            logger.warning(f"⚠ '{table_name}' falló (intento {intento + 1}), reintento en {espera:.1f}s: {e}")
+            time.sleep(espera)
+    return {
+        "tabla": table_name,
+        "ok": error is None,
+        "segundos": time.perf_counter() - inicio,
+        "intentos": intento + 1,
+        "error": None if error is None else str(error),
+    }
+
+
+def cargar_tablas(parquet_files: list, engine, logger, db_config) -> list:
+    """
+    Carga las tablas en paralelo con hasta db_config["workers"] escritores
+    (uno por conexión del pool), empezando por los archivos más grandes.
+    SQLite no admite escrituras concurrentes: ahí se carga de una en una.
+    """
+    workers = db_config["workers"]
+    if engine.dialect.name == "sqlite":
+        workers = 1
+    archivos = sorted(parquet_files, key=os.path.getsize, reverse=True)
+
+    if workers == 1 or len(archivos) <= 1:
+        return [cargar_tabla(f, engine, logger, db_config) for f in archivos]
+
+    logger.info(f"⚙️ Carga en paralelo: {min(workers, len(archivos))} tablas a la vez")
+    resultados = []
+    with ThreadPoolExecutor(max_workers=min(workers, len(archivos))) as pool:
+        futuros = [pool.submit(cargar_tabla, f, engine, logger, db_config) for f in archivos]
+        for futuro in as_completed(futuros):
+            resultados.append(futuro.result())
+    return resultados
+
+
+# =============================
+# REGISTRO DE CARGAS (LEDGER)
+# =============================
+
+
+def read_ledger() -> dict:
+    """Lee el registro de cargas si existe."""
+    if LEDGER_FILE.exists():
+        return json.loads(LEDGER_FILE.read_text(encoding="utf-8"))
+    return {}
+
+
+def write_ledger(data: dict):
+    """Escribe el registro de cargas completo."""
+    LEDGER_FILE.parent.mkdir(parents=True, exist_ok=True)
+    LEDGER_FILE.write_text(json.dumps(data, indent=2), encoding="utf-8")
+
+
+def destino_carga(db_config) -> str:
+    """Identifica la base de datos destino (las huellas se guardan por destino), sin contraseña."""
+    if db_config.get("url"):
+        return make_url(db_config["url"]).render_as_string(hide_password=True)
+    return f"mssql://{db_config['server']}/{db_config['database']}"
+
+
+def huella_parquet(file_path, previa: dict = None) -> dict:
+    """
+    Filas (del footer del Parquet), tamaño, mtime y sha256 del archivo.
+    Si tamaño y mtime coinciden con la huella previa se reutiliza su hash.
+    """
+    st = os.stat(file_path)
+    huella = {
+        "filas": pq.ParquetFile(file_path).metadata.num_rows,
+        "tamano": st.st_size,
+        "mtime": st.st_mtime,
+    }
+    if previa and all(previa.get(k) == v for k, v in huella.items()):
+        huella["hash"] = previa.get("hash")
+        return huella
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(bloque)
+    huella["hash"] = h.hexdigest()
+    return huella
+
+
+def sin_cambios(entrada: dict, huella: dict) -> bool:
+    """True si la última carga correcta fue del mismo contenido (filas y hash)."""
+    return bool(entrada) and entrada.get("filas") == huella["filas"] and entrada.get("hash") == huella["hash"]
+
+
+def ejecucion_carga(logger, force: bool = False):
+    """
+    Carga los Parquet de data/stage en la base de datos. Omite las tablas cuyo
+    Parquet no cambió desde su última carga correcta en el mismo destino
+    (config/load_ledger.json) y que siguen existiendo; force=True las carga todas.
+    """
     # Cargar configuración y engine
     db_config = load_env_variables(logger)
     engine = create_db_engine(db_config)
 
-    logger.info("DB_USERNAME:", db_config['username'])
-    logger.info("DB_PASSWORD:", "***" if db_config['password'] else None)
-    logger.info("DB_SERVER_IP:", db_config['server'])
-    logger.info("DB_DATABASE:", db_config['database'])
+    logger.info(f"DB_USERNAME: {db_config['username']}")
+    logger.info(f"DB_PASSWORD: {'***' if db_config['password'] else None}")
+    logger.info(f"DB_SERVER_IP: {db_config['server']}")
+    logger.info(f"DB_DATABASE: {db_config['database']}")
+    logger.info(
+        f"LOAD_MODE: {db_config['mode']} (eliminar ausentes: {db_config['delete']}, "
+        f"LOAD_WORKERS: {db_config['workers']}, LOAD_RETRIES: {db_config['retries']})"
+    )
 
     # Carpeta donde están los parquet
     parquet_files = get_parquet_files("data/stage/*.parquet")
@@ -63,10 +497,46 @@ def ejecucion_carga(logger):
         logger.info("No se encontraron archivos parquet en la ruta especificada.")
         return
 
-    # Cargar todos los archivos como tablas
-    for file in parquet_files:
-        load_parquet_to_sql(file, engine, logger)
+    # Omitir las tablas sin cambios desde la última carga
+    inicio = time.perf_counter()
+    ledger = read_ledger()
+    cargadas = ledger.setdefault(destino_carga(db_config), {})
+    tablas = {f: os.path.splitext(os.path.basename(f))[0] for f in parquet_files}
+    huellas = {tablas[f]: huella_parquet(f, cargadas.get(tablas[f])) for f in parquet_files}
+
+    omitidas = []
+    if not force:
+        existentes = set(inspect(engine).get_table_names())
+        omitidas = [
+            t for t in huellas if t in existentes and sin_cambios(cargadas.get(t), huellas[t])
+        ]
+        parquet_files = [f for f in parquet_files if tablas[f] not in omitidas]
+    for tabla in omitidas:
+        logger.info(f"⏭️ Sin cambios desde la última carga: {tabla}")
 
-    logger.info("¡Todas las tablas han sido cargadas correctamente!")
+    # Cargar todos los archivos como tablas
+    resultados = cargar_tablas(parquet_files, engine, logger, db_config)
+    engine.dispose()
 
+    # Solo las tablas cargadas sin error actualizan el registro
+    for r in resultados:
+        if r["ok"]:
+            cargadas[r["tabla"]] = {
+                **huellas[r["tabla"]],
+                "cargado": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            }
+        else:
+            cargadas.pop(r["tabla"], None)
+    write_ledger(ledger)
 
+    fallidas = [r for r in resultados if not r["ok"]]
+    logger.info(
+        f"📊 Load: {len(resultados) - len(fallidas)}/{len(resultados)} tablas OK, "
+        f"{len(omitidas)} sin cambios, en {time.perf_counter() - inicio:.1f}s"
+    )
+    for r in sorted(resultados, key=lambda r: r["segundos"], reverse=True):
+        estado = "✅" if r["ok"] else f"❌ {r['error']}"
+        logger.info(f"   {r['tabla']}: {r['segundos']:.1f}s ({r['intentos']} intento/s) {estado}")
+    if not fallidas:
+        logger.info("¡Todas las tablas han sido cargadas correctamente!")
+    return resultados
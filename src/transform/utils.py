@@ -1,9 +1,24 @@
 import ast
+import hashlib
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
 from pathlib import Path
 from pathlib import Path
-import logging
 from typing import Optional, Tuple
+from src.extract.load import iter_raw, listar_raw, read_raw
+from src.extract.schemas import ESQUEMAS, columnas_por_regla
 
 
 def config_logger():
@@ -56,32 +71,24 @@ COLUMNAS_ELIMINAR = {
     ],
 }
 
-COLUMNAS_NUMERICAS = {
-    "tasks": ["deals", "task_type", "task_stage", "related_companies"],
-    "deals": ["contact", "company"],
-    "calls": [
-        "audio_url",
-        "integration_id",
-        "related_companies",
-        "related_deals",
-        "related_contacts",
-    ],
-}
+# Reglas por dataset definidas en el registro de esquemas (src/extract/schemas.py)
+COLUMNAS_NUMERICAS = columnas_por_regla("ids_url")
 
-COLUMNAS_FECHA_HORA = {
-    "tasks": [
-        "start_datetime",
-        "end_datetime",
-        "due_date",
-        "created_at",
-        "created",
-        "modified",
-        "completed_date",
-    ],
-    "deals": ["created_at", "modified_at", "close_date"],
-    "calls": ["register_date", "modified_at", "call_time"],
-    "companies": ["last_viewed", "last_interaction", "created", "modified"],
-}
+COLUMNAS_IDS_LISTA = columnas_por_regla("ids_lista")
+
+COLUMNAS_FECHA_HORA = columnas_por_regla("fecha_hora")
+
+# Versión del código de Transform: subirla cuando cambie la lógica de limpieza
+# para que el manifiesto invalide las salidas anteriores
+TRANSFORM_VERSION = "5"
+
+# Manifiesto de entradas ya transformadas ({archivo: huella, versión, salidas})
+MANIFEST_FILE = Path("config/transform_manifest.json")
+
+# Logger para los bloques posteriores al primero (evita repetir los mismos
+# mensajes de limpieza por cada bloque)
+_logger_bloques = logging.getLogger("clientify_etl.bloques")
+_logger_bloques.setLevel(logging.WARNING)
 
 
 # =============================
@@ -90,58 +97,304 @@ COLUMNAS_FECHA_HORA = {
 
 
 def load_data(path: Path) -> pd.DataFrame:
-    """Carga un CSV en un DataFrame."""
-    return pd.read_csv(path)
+    """Carga un dataset raw (CSV o carpeta Parquet) en un DataFrame."""
+    return read_raw(path)
 
 
-def limpiar_columna_numeros(df: pd.DataFrame, columnas: list) -> pd.DataFrame:
-    """Limpia las columnas numéricas, eliminando caracteres no numéricos."""
-    for col in columnas:
-        if col in df.columns:
-            df[col] = (
-                df[col]
-                .astype(str)
-                .str.replace(r"[^0-9/]", "", regex=True)
-                .str.replace("/", "", regex=False)
-                .str.slice(1)
-                .replace("", pd.NA)
+def parsear_anidado(valor):
+    """
+    Devuelve listas/dicts de Python a partir de un valor anidado:
+    - texto JSON (raw Parquet) o repr de Python (raw CSV),
+    - arrays de numpy que entrega Arrow para listas nativas.
+    """
+    if isinstance(valor, str):
+        try:
+            return json.loads(valor)
+        except ValueError:
+            return ast.literal_eval(valor)
+    return _a_python(valor)
+
+
+# Tokens de un repr de Python que cambian al pasarlo a JSON
+_TOKEN_REPR = re.compile(r"""'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)"|\b(None|True|False)\b""")
+# Escapes de Python dentro de un texto (y comillas dobles sin escapar)
+_ESCAPE_REPR = re.compile(r'\\(x[0-9a-fA-F]{2}|.)|"')
+_LITERALES_JSON = {"None": "null", "True": "true", "False": "false"}
+
+
+def _escape_json(m) -> str:
+    escape = m.group(1)
+    if escape is None or escape == '"':
+        return '\\"'
+    if escape == "'":
+        return "'"
+    if escape[0] == "x" and len(escape) == 3:
+        return "\\u00" + escape[1:]
+    if escape in "\\bfnrtu":
+        return "\\" + escape
+    raise ValueError(f"escape no soportado: {escape}")
+
+
+def _token_json(m) -> str:
+    if m.group(3):
+        return _LITERALES_JSON[m.group(3)]
+    texto = m.group(1) if m.group(1) is not None else m.group(2)
+    return '"' + _ESCAPE_REPR.sub(_escape_json, texto) + '"'
+
+
+def _repr_a_json(texto: str) -> str:
+    """Traduce el repr de Python de listas/dicts a texto JSON."""
+    if '"' in texto or "\\" in texto or "\x00" in texto:
+        return _TOKEN_REPR.sub(_token_json, texto)
+    # Sin comillas dobles ni escapes todos los textos van entre comillas simples
+    # y no hay nada que traducir dentro: se cambian las comillas y los literales
+    # None/True/False de fuera de los textos (partes pares del split)
+    partes = texto.split("'")
+    fuera = "\x00".join(partes[0::2])
+    for literal, json_literal in _LITERALES_JSON.items():
+        fuera = fuera.replace(literal, json_literal)
+    partes[0::2] = fuera.split("\x00")
+    return '"'.join(partes)
+
+
+def _cargar_bloque(textos: pd.Series, omitir_errores: bool = False) -> list:
+    """json.loads de todas las filas a la vez; fila a fila si alguna falla."""
+    try:
+        parseados = json.loads(_repr_a_json("[" + ",".join(textos) + "]"))
+        if len(parseados) == len(textos):
+            return parseados
+    except ValueError:
+        pass
+    return [_parsear_texto(t, omitir_errores) for t in textos]
+
+
+def parsear_anidados(valores: pd.Series, omitir_errores: bool = False) -> pd.Series:
+    """
+    Versión en bloque de parsear_anidado para una columna completa.
+    Los textos con repr de Python (raw CSV) se traducen a JSON y se cargan con
+    un único json.loads; las filas que no se puedan traducir (tuplas, nan,
+    claves no texto…) usan parsear_anidado.
+    Con omitir_errores=True las filas inválidas quedan en None.
+    """
+    indice = valores.index
+    valores = valores.reset_index(drop=True)
+    es_texto = valores.map(lambda v: isinstance(v, str)).astype(bool)
+    resultado = valores.map(lambda v: v if isinstance(v, str) else _a_python(v))
+    textos = valores[es_texto]
+    if textos.empty:
+        resultado.index = indice
+        return resultado
+    # Las filas con comillas dobles o escapes van por la traducción con regex
+    complejos = textos.str.contains(r'["\\\x00]', regex=True).astype(bool)
+    for grupo in (textos[~complejos], textos[complejos]):
+        if not grupo.empty:
+            resultado[grupo.index] = pd.Series(
+                _cargar_bloque(grupo, omitir_errores), index=grupo.index, dtype=object
+            )
+    resultado.index = indice
+    return resultado
+
+
+def _parsear_texto(texto: str, omitir_errores: bool = False):
+    """JSON traducido desde repr si es posible; si no, parsear_anidado."""
+    try:
+        return json.loads(_repr_a_json(texto))
+    except ValueError:
+        pass
+    try:
+        return parsear_anidado(texto)
+    except (ValueError, SyntaxError):
+        if omitir_errores:
+            return None
+        raise
+
+
+def _a_python(valor):
+    """Convierte recursivamente arrays de numpy en listas."""
+    if isinstance(valor, np.ndarray):
+        return [_a_python(v) for v in valor.tolist()]
+    if isinstance(valor, dict):
+        return {k: _a_python(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_a_python(v) for v in valor]
+    return valor
+
+
+def anidados_a_json(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Columnas con listas o dicts (raw Parquet con tipos anidados de Arrow) a
+    texto JSON: data/stage y la base SQL solo admiten escalares.
+    """
+    for col in df.columns[df.dtypes == object]:
+        anidado = df[col].map(lambda v: isinstance(v, (list, dict, np.ndarray))).astype(bool)
+        if anidado.any():
+            df.loc[anidado, col] = df.loc[anidado, col].map(
+                lambda v: json.dumps(_a_python(v), ensure_ascii=False, default=str)
             )
     return df
 
 
-def separar_fecha_hora(df: pd.DataFrame, columnas: list) -> pd.DataFrame:
-    """Separa columnas datetime en dos: <col>_fecha y <col>_hora."""
+def _marcas_utc(serie: pd.Series) -> pa.Array:
+    """
+    Timestamps UTC de una columna. Los textos ISO 8601 con zona se convierten
+    con un único cast de Arrow; si algún valor no encaja (sin zona, basura…)
+    se usa pd.to_datetime con format="ISO8601" y los inválidos quedan nulos.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        marca = serie if serie.dt.tz is not None else serie.dt.tz_localize("UTC")
+        return pa.array(marca)
+    texto = serie.astype("string").to_numpy(dtype=object, na_value=None)
+    try:
+        return pc.cast(pa.array(texto, type=pa.string()), pa.timestamp("us", tz="UTC"))
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return pa.array(pd.to_datetime(serie, errors="coerce", utc=True, format="ISO8601"))
+
+
+def separar_fecha_hora(
+    df: pd.DataFrame, columnas: list, conservar_original: bool = False
+) -> pd.DataFrame:
+    """
+    Separa columnas datetime en dos: <col>_fecha (date32) y <col>_hora (time64).
+    Parsea cada columna en bloque (ISO 8601, en UTC) y obtiene fecha y hora con
+    casts de Arrow, sin objetos date/time por celda.
+    Con conservar_original=True se mantiene <col> como timestamp UTC.
+    """
     for col in columnas:
         if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors="coerce", utc=True)
-            df[f"{col}_fecha"] = df[col].dt.date
-            df[f"{col}_hora"] = df[col].dt.time
-            df = df.drop(columns=[col])
+            marcas = _marcas_utc(df[col])
+            df[f"{col}_fecha"] = pd.Series(
+                pc.cast(marcas, pa.date32()),
+                index=df.index,
+                dtype=pd.ArrowDtype(pa.date32()),
+            )
+            df[f"{col}_hora"] = pd.Series(
+                pc.cast(marcas, pa.time64("us"), safe=False),
+                index=df.index,
+                dtype=pd.ArrowDtype(pa.time64("us")),
+            )
+            if conservar_original:
+                df[col] = marcas.to_pandas().set_axis(df.index)
+            else:
+                df = df.drop(columns=[col])
     return df
 
 
-def eliminar_urls(df: pd.DataFrame, nombre: str) -> pd.DataFrame:
+# URL de un recurso de la API: el id es el último tramo numérico
+# (https://api.clientify.net/v1/contacts/123/ → 123); un id suelto se conserva
+PATRON_URL_ID = r"^\s*(?:https?://\S*?/)?(?P<id>\d+)/?\s*$"
+_URL_ID_EN_LISTA = re.compile(r"https?://[^\s'\",\]]*?/(\d+)/?(?=[\s'\",\]]|$)")
+_URL_RECURSO = re.compile(r"^\s*https?://\S*?/\d+/?\s*$")
+
+
+def _es_lista(valor) -> bool:
+    return isinstance(valor, (list, np.ndarray)) or (
+        isinstance(valor, str) and valor.lstrip().startswith("[")
+    )
+
+
+def _muestra(serie: pd.Series, tamano: int) -> list:
+    """Hasta tamano valores no nulos repartidos por toda la columna (sin listas vacías)."""
+    valores = serie.dropna()
+    if len(valores) > tamano:
+        valores = valores.iloc[:: len(valores) // tamano]
+    return [
+        v for v in valores.tolist()
+        if not (isinstance(v, str) and v.strip() == "[]") and not (_es_lista(v) and len(v) == 0)
+    ]
+
+
+def es_columna_url(serie: pd.Series, muestra: int = 100, minimo: float = 0.9) -> bool:
     """
-    Recorre todas las columnas del DataFrame.
-    Si el primer valor de una columna comienza con 'http' o 'https',
-    limpia esa columna:
-    - Mantiene solo números
-    - Elimina el primer carácter (por ejemplo, un número basura)
+    True si al menos `minimo` de una muestra de valores son URLs de un recurso
+    de la API (o listas de ellas), en lugar de mirar solo el primer valor.
     """
-    if nombre == "users":
-        return df
+    if serie.dtype.kind not in "OSU" and not isinstance(
+        serie.dtype, (pd.StringDtype, pd.CategoricalDtype)
+    ):
+        return False
+    valores = _muestra(serie, muestra)
+    if not valores:
+        return False
+    urls = 0
+    for v in valores:
+        if isinstance(v, str) and not _es_lista(v):
+            urls += bool(_URL_RECURSO.match(v))
+        elif _es_lista(v):
+            urls += bool(_URL_ID_EN_LISTA.search(str(v if isinstance(v, str) else v[0])))
+    return urls / len(valores) >= minimo
+
+
+def _ids_escalares(serie: pd.Series) -> pd.Series:
+    """Id final de cada URL con pyarrow.compute (Int64; nulo si no es URL de recurso)."""
+    texto = serie.astype("string").to_numpy(dtype=object, na_value=None)
+    ids = pc.struct_field(
+        pc.extract_regex(pa.array(texto, type=pa.string()), pattern=PATRON_URL_ID), [0]
+    )
+    ids = pc.cast(ids, pa.int64())
+    ids = ids.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+    return ids.set_axis(serie.index).rename(serie.name)
+
+
+def _ids_de_listas(serie: pd.Series) -> pd.Series:
+    """Ids de columnas con listas de URLs (related_deals…) unidos por comas."""
+
+    def ids_fila(valor):
+        if isinstance(valor, str):
+            ids = _URL_ID_EN_LISTA.findall(valor)
+        elif isinstance(valor, (list, np.ndarray)):
+            ids = [m.group(1) for v in valor if (m := _URL_ID_EN_LISTA.search(str(v)))]
+        else:
+            return pd.NA
+        return ",".join(ids) if ids else pd.NA
+
+    return serie.map(ids_fila).astype("string")
 
-    for col in df.columns:
-        primer_valor = str(df[col].iloc[0]).lower()
 
-        if primer_valor.startswith("http"):
+def es_columna_lista(serie: pd.Series) -> bool:
+    """True si algún valor de la columna es una lista (también "[]" o vacía)."""
+    return bool(serie.dropna().map(_es_lista).any())
 
-            # Dejar solo números en toda la columna
-            df[col] = df[col].astype(str).str.replace(r"[^0-9]", "", regex=True)
 
-            # Eliminar solo el segundo carácter por que nose
-            df[col] = df[col].str[1:]
+def extraer_ids_url(serie: pd.Series, lista: bool = None) -> pd.Series:
+    """
+    Convierte una columna de URLs de la API en el id del recurso:
+    - URL única → Int64,
+    - lista de URLs → texto con los ids separados por comas.
+    lista fija el formato (reglas ids_url / ids_lista del esquema); si es None
+    se decide con toda la columna (es_columna_lista), no con una muestra.
+    """
+    if lista is None:
+        lista = es_columna_lista(serie)
+    return _ids_de_listas(serie) if lista else _ids_escalares(serie)
+
+
+def detectar_columnas_url(df: pd.DataFrame, muestra: int = 100) -> list:
+    """Columnas de df que es_columna_url reconoce como URLs de la API."""
+    return [col for col in df.columns if es_columna_url(df[col], muestra)]
+
+
+def limpiar_urls(
+    df: pd.DataFrame, nombre: str, columnas: list = None, muestra: int = 100, listas: dict = None
+) -> pd.DataFrame:
+    """
+    Reemplaza las columnas con URLs de la API por el id del recurso.
+    Con columnas se convierten esas (reglas ids_url e ids_lista del esquema);
+    si no, las que es_columna_url detecte a partir de una muestra. No aplica a users.
+    Las columnas de ids_lista salen siempre como texto y las de ids_url como
+    Int64, sea cual sea el contenido del bloque; para el resto se usa listas
+    ({columna: es_lista}, fijado en el primer bloque) o decide extraer_ids_url.
+    """
+    if nombre == "users":
+        return df
 
+    if columnas is None:
+        columnas = detectar_columnas_url(df, muestra)
+    formato = dict(listas or {})
+    formato.update(dict.fromkeys(COLUMNAS_NUMERICAS.get(nombre, []), False))
+    formato.update(dict.fromkeys(COLUMNAS_IDS_LISTA.get(nombre, []), True))
+    for col in columnas:
+        if col in df.columns:
+            df[col] = extraer_ids_url(df[col], formato.get(col))
     return df
 
 
@@ -158,24 +411,33 @@ def desanidar_columna(df: pd.DataFrame, columna: str) -> pd.DataFrame:
     pd.DataFrame: DataFrame con las columnas desanidadas.
     """
     # Convertir la columna a listas de diccionarios (si está en formato string)
-    df[columna] = df[columna].apply(
-        lambda x: ast.literal_eval(x) if isinstance(x, str) else x
+    listas = parsear_anidados(df[columna])
+    listas.index = pd.RangeIndex(len(df))
+
+    # Un registro por par field/value (explode) en lugar de un dict por fila
+    items = listas.explode().dropna()
+    pares = pd.DataFrame(
+        {
+            "fila": items.index,
+            "field": items.str.get("field").to_numpy(),
+            "value": items.str.get("value").to_numpy(),
+        }
     )
 
-    # Expandir cada fila en un diccionario plano
-    filas_expandidas = []
-    for lista_diccionarios in df[columna]:
-        fila = {}
-        for item in lista_diccionarios:
-            valor = item.get("value")
-            # Si el valor es lista, convertir a string separado por comas
-            if isinstance(valor, list):
-                valor = ", ".join(valor)
-            fila[item.get("field")] = valor
-        filas_expandidas.append(fila)
-
-    # Crear DataFrame final
-    df_desanidado = pd.DataFrame(filas_expandidas)
+    # Si el valor es lista, convertir a string separado por comas
+    es_lista = pares["value"].map(lambda v: isinstance(v, list)).astype(bool)
+    pares.loc[es_lista, "value"] = pares.loc[es_lista, "value"].str.join(", ")
+
+    # Formato ancho: una columna por field, en orden de aparición; si un field
+    # se repite en la misma fila gana el último (igual que el dict por fila)
+    orden = pares["field"].drop_duplicates().tolist()
+    pares = pares.drop_duplicates(subset=["fila", "field"], keep="last")
+    df_desanidado = (
+        pares.pivot(index="fila", columns="field", values="value")
+        .reindex(index=range(len(df)), columns=orden)
+        .infer_objects()
+    )
+    df_desanidado.columns.name = None
 
     # Mantener el índice original para poder unir si se necesita
     df_desanidado.index = df.index
@@ -183,7 +445,6 @@ def desanidar_columna(df: pd.DataFrame, columna: str) -> pd.DataFrame:
     return df_desanidado
 
 
-
 def custom_columns(
     logger,
     df: pd.DataFrame,
@@ -231,31 +492,39 @@ def custom_columns(
 
 def expand_stage_durations(
     df: pd.DataFrame, id_col: str = "id", stages_col: str = "stages_duration"
-):
-    registros = []
-    df = df[[id_col, stages_col]].dropna(subset=[stages_col])
-    for _, row in df[[id_col, stages_col]].iterrows():
-        id_value = row[id_col]
-
-        # Convertir string -> lista de diccionarios
-        try:
-            lista_stages = ast.literal_eval(row[stages_col])
-        except Exception:
-            continue
-        # Recorrer cada diccionario dentro de la lista
-        for item in lista_stages:
-            dur = item.get("stage_duration", {})
-            registros.append(
-                {
-                    "id": id_value,
-                    "stage_name": item.get("stage_name", None),
-                    "days": dur.get("days", None),
-                    "hours": dur.get("hours", None),
-                    "minutes": dur.get("minutes", None),
-                }
-            )
+) -> pd.DataFrame:
+    """
+    Expande stages_duration (lista de etapas por deal) a una fila por etapa:
+    id, stage_name, days, hours, minutes (Int64) y total_minutes.
+    Parsea la columna en bloque y usa explode en lugar de recorrer filas;
+    los valores que no se pueden parsear se omiten.
+    """
+    df = df[[id_col, stages_col]].dropna(subset=[stages_col]).reset_index(drop=True)
+    listas = parsear_anidados(df[stages_col], omitir_errores=True).astype(object)
+
+    # Una fila por etapa, conservando el id del deal por posición
+    etapas = listas.explode().dropna()
+    registros = [e if isinstance(e, dict) else {} for e in etapas]
+    duraciones = [r.get("stage_duration") or {} for r in registros]
+    campos = pd.DataFrame(registros, columns=["stage_name"])
+    unidades = pd.DataFrame(duraciones, columns=["days", "hours", "minutes"])
+
+    resultado = pd.DataFrame(
+        {
+            "id": df[id_col].to_numpy()[etapas.index.to_numpy(dtype=int)],
+            "stage_name": campos["stage_name"].to_numpy(dtype=object),
+        }
+    )
+    for unidad in ("days", "hours", "minutes"):
+        resultado[unidad] = pd.to_numeric(unidades[unidad], errors="coerce").astype("Int64")
 
-    return pd.DataFrame(registros)
+    # Duración total de la etapa en minutos (nula si no hay ninguna unidad)
+    resultado["total_minutes"] = (
+        resultado["days"].mul(1440, fill_value=0)
+        + resultado["hours"].mul(60, fill_value=0)
+        + resultado["minutes"].fillna(0)
+    ).mask(resultado[["days", "hours", "minutes"]].isna().all(axis=1))
+    return resultado
 
 
 def limpiezas_especificas(logger, df: pd.DataFrame, nombre: str) -> pd.DataFrame:
@@ -269,26 +538,136 @@ def limpiezas_especificas(logger, df: pd.DataFrame, nombre: str) -> pd.DataFrame
         df = df.drop(columns=columnas_a_eliminar)
         logger.info(f"🗑 Columnas eliminadas: {columnas_a_eliminar}")
     # Otras limpiezas (si aplican)
-    if nombre in COLUMNAS_NUMERICAS:
-        df = limpiar_columna_numeros(df, COLUMNAS_NUMERICAS[nombre])
-        logger.info(f"🔢 Columnas numéricas limpiadas: {COLUMNAS_NUMERICAS[nombre]}")
+    if nombre in COLUMNAS_NUMERICAS or nombre in COLUMNAS_IDS_LISTA:
+        columnas = COLUMNAS_NUMERICAS.get(nombre, []) + COLUMNAS_IDS_LISTA.get(nombre, [])
+        df = limpiar_urls(df, nombre, columnas)
+        logger.info(f"🔢 Columnas numéricas limpiadas: {columnas}")
     if nombre in COLUMNAS_FECHA_HORA:
         df = separar_fecha_hora(df, COLUMNAS_FECHA_HORA[nombre])
         logger.info(f"📅 Columnas fecha/hora separadas: {COLUMNAS_FECHA_HORA[nombre]}")
     return df
 
 
+def ruta_stage(nombre: str) -> Path:
+    """Ruta del Parquet de data/stage para un dataset (crea la carpeta)."""
+    path = Path(root / "data" / "stage")
+    path.mkdir(parents=True, exist_ok=True)
+    return path / f"{nombre}.parquet"
+
+
 def guardar_parquet(logger, df: pd.DataFrame, nombre: str) -> Path:
     """Guarda el DataFrame en formato Parquet y devuelve la ruta."""
-    path = root / "data" / "stage"
-    path = Path(path)
-    path.mkdir(parents=True, exist_ok=True)
-    ruta_salida = path / f"{nombre}.parquet"
+    ruta_salida = ruta_stage(nombre)
+    df = anidados_a_json(df.copy())
     df.to_parquet(ruta_salida, index=False, engine="pyarrow")
     logger.info(f"✅ Guardado: {ruta_salida}")
     return ruta_salida
 
 
+def _tipo_estable(tipo: pa.DataType) -> pa.DataType:
+    """Categóricas con índice int32 para que todos los bloques compartan tipo."""
+    if pa.types.is_dictionary(tipo):
+        return pa.dictionary(pa.int32(), tipo.value_type)
+    return tipo
+
+
+class EscritorParquet:
+    """
+    Escribe un Parquet de data/stage bloque a bloque (un row group por bloque).
+
+    El esquema lo fija el primer bloque no vacío; las columnas que llegan
+    totalmente nulas en él se declaran texto. Los bloques siguientes se
+    convierten a ese esquema (columnas faltantes como nulos, sobrantes se
+    descartan) y un tipo incompatible produce un error con la columna.
+    Se escribe a un archivo temporal que reemplaza la salida al cerrar.
+    """
+
+    def __init__(self, logger, ruta: Path):
+        self.logger = logger
+        self.ruta = Path(ruta)
+        self.esquema = None
+        self.filas = 0
+        self.bloques = 0
+        self._tmp = self.ruta.with_name(self.ruta.name + ".tmp")
+        self._writer = None
+        self._vacio = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, error, traza):
+        if error is None:
+            self.cerrar()
+        else:
+            self.descartar()
+        return False
+
+    def _iniciar(self, df: pd.DataFrame):
+        nulas = [
+            col for col in df.columns
+            if df[col].dtype in (object, np.float64) and df[col].isna().all()
+        ]
+        df = df.astype({col: "string" for col in nulas})
+        esquema = pa.Schema.from_pandas(df, preserve_index=False)
+        self.esquema = pa.schema(
+            [f.with_type(_tipo_estable(f.type)) for f in esquema],
+            metadata=esquema.metadata,
+        )
+        self._writer = pq.ParquetWriter(self._tmp, self.esquema)
+        return df
+
+    def _ajustar(self, tabla: pa.Table) -> pa.Table:
+        sobrantes = set(tabla.column_names) - set(self.esquema.names)
+        if sobrantes:
+            self.logger.warning(f"⚠ Columnas fuera del esquema descartadas: {sorted(sobrantes)}")
+        columnas = []
+        for campo in self.esquema:
+            if campo.name not in tabla.column_names:
+                columnas.append(pa.nulls(len(tabla), campo.type))
+                continue
+            columna = tabla[campo.name]
+            if columna.type != campo.type:
+                try:
+                    columna = columna.cast(campo.type)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                    raise ValueError(
+                        f"Columna {campo.name}: el bloque trae {columna.type} y el "
+                        f"esquema del primer bloque es {campo.type} "
+                        f"(declárala en src/extract/schemas.py): {e}"
+                    ) from e
+            columnas.append(columna)
+        return pa.Table.from_arrays(columnas, schema=self.esquema)
+
+    def escribir(self, df: pd.DataFrame):
+        """Añade df como un row group."""
+        if df.empty:
+            self._vacio = df
+            return
+        df = anidados_a_json(df.copy())
+        if self._writer is None:
+            df = self._iniciar(df)
+        tabla = pa.Table.from_pandas(df, preserve_index=False)
+        self._writer.write_table(self._ajustar(tabla))
+        self.filas += len(df)
+        self.bloques += 1
+
+    def cerrar(self):
+        """Cierra el writer y publica el Parquet (vacío si no hubo filas)."""
+        if self._writer is None:
+            (self._vacio if self._vacio is not None else pd.DataFrame()).to_parquet(
+                self._tmp, index=False, engine="pyarrow"
+            )
+        else:
+            self._writer.close()
+        os.replace(self._tmp, self.ruta)
+
+    def descartar(self):
+        """Cierra el writer y elimina el archivo temporal."""
+        if self._writer is not None:
+            self._writer.close()
+        self._tmp.unlink(missing_ok=True)
+
+
 # =============================
 # FUNCIÓN DE LIMPIEZA GENERAL
 # =============================
@@ -312,47 +691,345 @@ def limpieza_anidados(logger, df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def limpiar_archivos(logger):
+def procesar_archivo(logger, archivo: Path, chunk_rows: int = 0) -> list:
+    """
+    Carga, limpia y guarda en data/stage un dataset de data/raw.
+    Con chunk_rows > 0 lo procesa por bloques (procesar_por_bloques).
+    Devuelve las rutas de los Parquet generados.
+    """
+    nombre = archivo.stem.lower()
+    if chunk_rows:
+        return procesar_por_bloques(logger, archivo, chunk_rows)
+
+    logger.info(f"\n Procesando: {archivo.name} ")
+    df = load_data(archivo)
+    if nombre == "deals":
+        logger.info("Aplicando limpieza específica para deals")
+        # df = ejecutar_limpieza(df, nombre)
+        df = limpiar_urls(df, nombre)
+        # df = limpieza_anidados(df)
+        df, df_desanidado = custom_columns(logger, df, nombre)
+        salidas = [guardar_parquet(logger, df, nombre)]
+        # df_desanidado = limpieza_anidados(df_desanidado)
+        salidas.append(guardar_parquet(logger, df_desanidado, f"{nombre}_desanidado"))
+    elif nombre == "calls":
+        logger.info("Aplicando limpieza específica para calls")
+        df = ejecutar_limpieza(logger, df, nombre)
+        df = limpiar_urls(df, nombre)
+        # df = limpieza_anidados(df) # Elimina comentarios
+        salidas = [guardar_parquet(logger, df, nombre)]
+    elif nombre == "deal_times":
+        logger.info("Aplicando limpieza específica para deal_times")
+        df = expand_stage_durations(df, id_col="id", stages_col="stages_duration")
+        salidas = [guardar_parquet(logger, df, nombre)]
+    elif nombre == "users":
+        logger.info("Aplicando limpieza específica para users")
+        salidas = [guardar_parquet(logger, df, nombre)]
+    else:
+        df = ejecutar_limpieza(logger, df, nombre)
+        df = limpiar_urls(df, nombre)
+        # df = limpieza_anidados(df)
+        salidas = [guardar_parquet(logger, df, nombre)]
+    return salidas
+
+
+def _campos_custom(archivo: Path, chunk_rows: int) -> list:
+    """Fields de custom_fields de deals en orden de aparición, leídos por bloques."""
+    orden = {}
+    for bloque in iter_raw(archivo, chunk_rows, columns=["custom_fields"]):
+        if "custom_fields" not in bloque.columns:
+            return []
+        items = parsear_anidados(bloque["custom_fields"]).explode().dropna()
+        orden.update(dict.fromkeys(items.str.get("field").dropna()))
+    return list(orden)
+
+
+def _deals_por_bloques(logger, archivo: Path, chunk_rows: int) -> list:
+    """
+    deals por bloques: una primera pasada solo sobre custom_fields fija las
+    columnas de deals_desanidado; la segunda escribe ambas tablas.
+    """
+    nombre = "deals"
+    campos = _campos_custom(archivo, chunk_rows)
+    columnas_url = None
+    with EscritorParquet(logger, ruta_stage(nombre)) as principal, EscritorParquet(
+        logger, ruta_stage(f"{nombre}_desanidado")
+    ) as secundario:
+        for bloque in iter_raw(archivo, chunk_rows):
+            if columnas_url is None:
+                columnas_url = detectar_columnas_url(bloque)
+                listas = {c: es_columna_lista(bloque[c]) for c in columnas_url}
+            bloque = limpiar_urls(bloque, nombre, columnas_url, listas=listas)
+            if "custom_fields" not in bloque.columns:
+                principal.escribir(bloque)
+                continue
+            principal.escribir(bloque.drop(columns=["custom_fields"]))
+
+            desanidado = desanidar_columna(bloque[["id", "custom_fields"]], "custom_fields")
+            desanidado = pd.concat([bloque[["id"]], desanidado.reindex(columns=campos)], axis=1)
+            secundario.escribir(desanidado[~desanidado.drop(columns=["id"]).isna().all(axis=1)])
+
+    salidas = [principal.ruta]
+    if campos:
+        salidas.append(secundario.ruta)
+        logger.info(f"[deals] Filas generadas en deals_custom: {secundario.filas}")
+    else:
+        secundario.ruta.unlink(missing_ok=True)
+    return salidas
+
+
+def procesar_por_bloques(logger, archivo: Path, chunk_rows: int) -> list:
+    """
+    Igual que procesar_archivo pero con memoria acotada: lee el dataset en
+    bloques de chunk_rows filas, aplica a cada uno las mismas limpiezas y los
+    añade como row groups al Parquet de data/stage. Las columnas con URL se
+    detectan en el primer bloque, junto con su formato (id o lista de ids), y
+    se reutilizan en el resto.
+    """
+    nombre = archivo.stem.lower()
+    logger.info(f"\n Procesando por bloques de {chunk_rows} filas: {archivo.name} ")
+
+    if nombre == "deals":
+        salidas = _deals_por_bloques(logger, archivo, chunk_rows)
+    else:
+        columnas_url = None
+        with EscritorParquet(logger, ruta_stage(nombre)) as escritor:
+            for i, bloque in enumerate(iter_raw(archivo, chunk_rows)):
+                if nombre == "deal_times":
+                    bloque = expand_stage_durations(bloque, id_col="id", stages_col="stages_duration")
+                elif nombre != "users":
+                    bloque = ejecutar_limpieza(logger if i == 0 else _logger_bloques, bloque, nombre)
+                    if columnas_url is None:
+                        columnas_url = detectar_columnas_url(bloque)
+                        listas = {c: es_columna_lista(bloque[c]) for c in columnas_url}
+                    bloque = limpiar_urls(bloque, nombre, columnas_url, listas=listas)
+                escritor.escribir(bloque)
+        salidas = [escritor.ruta]
+
+    for ruta in salidas:
+        logger.info(f"✅ Guardado: {ruta} ({pq.ParquetFile(ruta).metadata.num_row_groups} row groups)")
+    return salidas
+
+
+def filas_por_bloque() -> int:
+    """Filas por bloque de Transform (TRANSFORM_CHUNK_ROWS en .env, 0 = sin bloques)."""
+    load_dotenv(root / ".env")
+    try:
+        return max(0, int(os.getenv("TRANSFORM_CHUNK_ROWS", "0")))
+    except ValueError:
+        return 0
+
+
+def _procesar_aislado(logger, archivo: Path, chunk_rows: int = 0) -> dict:
+    """Ejecuta procesar_archivo sin propagar errores; devuelve el resultado."""
+    inicio = time.perf_counter()
+    salidas = []
+    try:
+        salidas = procesar_archivo(logger, archivo, chunk_rows)
+        error = None
+    except Exception as e:
+        logger.exception(f"❌ Error procesando {archivo.name}: {e}")
+        error = str(e)
+    return {
+        "archivo": archivo.name,
+        "ok": error is None,
+        "segundos": time.perf_counter() - inicio,
+        "error": error,
+        "salidas": [str(p) for p in salidas],
+    }
+
+
+# =============================
+# MANIFIESTO (TRANSFORM INCREMENTAL)
+# =============================
+
+
+def read_manifest() -> dict:
+    """Lee el manifiesto de Transform si existe."""
+    if MANIFEST_FILE.exists():
+        return json.loads(MANIFEST_FILE.read_text(encoding="utf-8"))
+    return {}
+
+
+def write_manifest(data: dict):
+    """Escribe el manifiesto de Transform completo."""
+    MANIFEST_FILE.parent.mkdir(parents=True, exist_ok=True)
+    MANIFEST_FILE.write_text(json.dumps(data, indent=2), encoding="utf-8")
+
+
+def version_reglas() -> str:
+    """
+    TRANSFORM_VERSION más un hash de las reglas declarativas (columnas a
+    eliminar y registro de esquemas): cambiar cualquiera invalida el manifiesto.
+    """
+    reglas = json.dumps(
+        {"version": TRANSFORM_VERSION, "eliminar": COLUMNAS_ELIMINAR, "esquemas": ESQUEMAS},
+        sort_keys=True,
+    )
+    return f"{TRANSFORM_VERSION}-{hashlib.sha256(reglas.encode()).hexdigest()[:12]}"
+
+
+def _hash_archivos(rutas: list) -> str:
+    """sha256 del contenido de los archivos, leídos por bloques."""
+    h = hashlib.sha256()
+    for ruta in rutas:
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(bloque)
+    return h.hexdigest()
+
+
+def huella_entrada(archivo: Path, previa: dict = None) -> dict:
+    """
+    Tamaño, mtime y hash de un CSV o de una carpeta Parquet de data/raw.
+    Si tamaño y mtime coinciden con la huella previa se reutiliza su hash
+    (no se relee el archivo).
+    """
+    rutas = sorted(archivo.rglob("*.parquet")) if archivo.is_dir() else [archivo]
+    stats = [r.stat() for r in rutas]
+    huella = {
+        "archivos": len(rutas),
+        "tamano": sum(st.st_size for st in stats),
+        "mtime": max((st.st_mtime for st in stats), default=0),
+    }
+    if previa and all(previa.get(k) == v for k, v in huella.items()):
+        huella["hash"] = previa.get("hash")
+    else:
+        huella["hash"] = _hash_archivos(rutas)
+    return huella
+
+
+def sin_cambios(entrada: dict, huella: dict, version: str) -> bool:
+    """True si la entrada del manifiesto corresponde a la misma huella y reglas
+    y sus salidas siguen existiendo en data/stage."""
+    if not entrada or entrada.get("version") != version:
+        return False
+    if entrada.get("entrada", {}).get("hash") != huella["hash"]:
+        return False
+    return all(Path(p).exists() for p in entrada.get("salidas", []))
+
+
+def _tamano(archivo: Path) -> int:
+    """Tamaño en bytes de un CSV o de una carpeta Parquet."""
+    if archivo.is_dir():
+        return sum(p.stat().st_size for p in archivo.rglob("*.parquet"))
+    return archivo.stat().st_size
+
+
+def _iniciar_worker(cola):
+    """Los procesos del pool envían sus logs a la cola del proceso principal."""
+    logger = logging.getLogger("clientify_etl")
+    logger.handlers.clear()
+    logger.addHandler(logging.handlers.QueueHandler(cola))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def workers_transform() -> int:
+    """Procesos para Transform (TRANSFORM_WORKERS en .env, 1 por defecto)."""
+    load_dotenv(root / ".env")
+    try:
+        return max(1, int(os.getenv("TRANSFORM_WORKERS", "1")))
+    except ValueError:
+        return 1
+
+
+def _ejecutar_pool(logger, archivos: list, max_workers: int, cola, chunk_rows: int = 0) -> list:
+    """Reparte los archivos en un pool de procesos y recoge sus resultados."""
+    resultados = []
+    with ProcessPoolExecutor(
+        max_workers=min(max_workers, len(archivos)),
+        initializer=_iniciar_worker,
+        initargs=(cola,),
+    ) as pool:
+        futuros = {
+            pool.submit(_procesar_aislado, logger, archivo, chunk_rows): archivo
+            for archivo in archivos
+        }
+        for futuro in as_completed(futuros):
+            try:
+                resultados.append(futuro.result())
+            except Exception as e:
+                # El proceso del worker murió (p. ej. sin memoria)
+                archivo = futuros[futuro]
+                logger.error(f"❌ Error procesando {archivo.name}: {e}")
+                resultados.append(
+                    {"archivo": archivo.name, "ok": False, "segundos": 0.0, "error": str(e)}
+                )
+    return resultados
+
+
+def limpiar_archivos(
+    logger, max_workers: int = None, force: bool = False, chunk_rows: int = None
+) -> list:
     """
-    Función principal para cargar y limpiar archivos CSV en una carpeta dada.
+    Función principal para cargar y limpiar archivos CSV (o datasets Parquet)
+    en una carpeta dada.
+    Omite los datasets cuya entrada (tamaño, mtime, hash) y reglas no cambiaron
+    desde la última ejecución según el manifiesto; force=True los procesa todos.
+    Con max_workers > 1 (o TRANSFORM_WORKERS) reparte los datasets en un pool de
+    procesos, empezando por los más grandes. Con chunk_rows > 0 (o
+    TRANSFORM_CHUNK_ROWS) cada dataset se procesa por bloques con memoria
+    acotada. Un error en un archivo no detiene
+    al resto; al final se registra un resumen. Devuelve el resultado por archivo.
     """
 
     ruta = Path(root / "data" / "raw")
-    archivos = list(ruta.glob("*.csv"))
+    archivos = listar_raw(ruta)
 
     if not archivos:
         logger.info("⚠ No se encontraron archivos CSV en la carpeta.")
-        return
-
-    for archivo in archivos:
-        nombre = archivo.stem.lower()
-
-        logger.info(f"\n Procesando: {archivo.name} ")
-        df = load_data(archivo)
-        if nombre == "deals":
-            logger.info("Aplicando limpieza específica para deals")
-            # df = ejecutar_limpieza(df, nombre)
-            df = eliminar_urls(df, nombre)
-            # df = limpieza_anidados(df)
-            df, df_desanidado = custom_columns(logger, df, nombre)
-            guardar_parquet(logger, df, nombre)
-            # df_desanidado = limpieza_anidados(df_desanidado)
-            guardar_parquet(logger, df_desanidado, f"{nombre}_desanidado")
-        elif nombre == "calls":
-            logger.info("Aplicando limpieza específica para calls")
-            df = ejecutar_limpieza(logger, df, nombre)
-            df = eliminar_urls(df, nombre)
-            # df = limpieza_anidados(df) # Elimina comentarios
-            guardar_parquet(logger, df, nombre)
-        elif nombre == "deal_times":
-            logger.info("Aplicando limpieza específica para deal_times")
-            df = expand_stage_durations(df, id_col="id", stages_col="stages_duration")
-            guardar_parquet(logger, df, nombre)
-        elif nombre == "users":
-            logger.info("Aplicando limpieza específica para users")
-            guardar_parquet(logger, df, nombre)
+        return []
+
+    inicio = time.perf_counter()
+    manifiesto = read_manifest()
+    version = version_reglas()
+    huellas = {a.name: huella_entrada(a, manifiesto.get(a.name, {}).get("entrada")) for a in archivos}
+
+    omitidos = []
+    if not force:
+        omitidos = [a for a in archivos if sin_cambios(manifiesto.get(a.name), huellas[a.name], version)]
+        archivos = [a for a in archivos if a not in omitidos]
+    for archivo in omitidos:
+        logger.info(f"⏭️ Sin cambios desde la última transformación: {archivo.name}")
+
+    max_workers = max_workers or workers_transform()
+    chunk_rows = filas_por_bloque() if chunk_rows is None else chunk_rows
+    archivos = sorted(archivos, key=_tamano, reverse=True)
+
+    if max_workers == 1 or len(archivos) <= 1:
+        resultados = [_procesar_aislado(logger, archivo, chunk_rows) for archivo in archivos]
+    else:
+        logger.info(f"⚙️ Transform en paralelo: {max_workers} procesos")
+        with multiprocessing.Manager() as manager:
+            cola = manager.Queue()
+            listener = logging.handlers.QueueListener(
+                cola, *logger.handlers, respect_handler_level=True
+            )
+            listener.start()
+            try:
+                resultados = _ejecutar_pool(logger, archivos, max_workers, cola, chunk_rows)
+            finally:
+                listener.stop()
+
+    # Solo los archivos transformados sin error actualizan el manifiesto
+    for r in resultados:
+        if r["ok"]:
+            manifiesto[r["archivo"]] = {
+                "version": version,
+                "entrada": huellas[r["archivo"]],
+                "salidas": r["salidas"],
+            }
         else:
-            df = ejecutar_limpieza(logger, df, nombre)
-            df = eliminar_urls(df, nombre)
-            # df = limpieza_anidados(df)
-            guardar_parquet(logger, df, nombre)
+            manifiesto.pop(r["archivo"], None)
+    write_manifest(manifiesto)
+
+    fallidos = [r for r in resultados if not r["ok"]]
+    logger.info(
+        f"📊 Transform: {len(resultados) - len(fallidos)}/{len(resultados)} archivos OK, "
+        f"{len(omitidos)} sin cambios, en {time.perf_counter() - inicio:.1f}s"
+    )
+    for r in sorted(resultados, key=lambda r: r["segundos"], reverse=True):
+        estado = "✅" if r["ok"] else f"❌ {r['error']}"
+        logger.info(f"   {r['archivo']}: {r['segundos']:.1f}s {estado}")
+    return resultados
@@ -0,0 +1,143 @@
+"""
+Benchmark de la capa de extracción contra la API simulada (mock_clientify).
+
+Mide páginas/s de extract_all, una segunda extracción incremental (checkpoints
+y caché condicional con 304), deals/s de extraccion_tiempos y el pico de
+memoria (tracemalloc) de cada fase, sin credenciales reales. Se ejecuta en un
+directorio temporal para no tocar checkpoints, caché ni data/ del proyecto.
+
+Uso:
+    python test/bench_extract.py --paginas 50 --deals 2000 --latencia 0.05 --workers 8
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+
+from mock_clientify import ID_BASE, MockConfig, iniciar_servidor  # noqa: E402
+
+
+def medir(funcion):
+    """Ejecuta funcion() y devuelve (resultado, segundos, pico_mb)."""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcion()
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, segundos, pico / 1024**2
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extracción Clientify")
+    parser.add_argument("--paginas", type=int, default=20)
+    parser.add_argument("--deals", type=int, default=500)
+    parser.add_argument("--latencia", type=float, default=0.02)
+    parser.add_argument("--tasa-404", type=float, default=0.01)
+    parser.add_argument("--tasa-429", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=50.0, help="ritmo inicial req/s")
+    parser.add_argument("--max-rate", type=float, default=200.0)
+    parser.add_argument("--sin-streaming", action="store_true")
+    args = parser.parse_args()
+
+    cfg = MockConfig(
+        paginas=args.paginas,
+        latencia=args.latencia,
+        tasa_404=args.tasa_404,
+        tasa_429=args.tasa_429,
+        retry_after=0.5,
+    )
+    servidor, base_url, stats = iniciar_servidor(cfg)
+    os.environ["BASE_URL"] = base_url
+    os.environ.setdefault("TOKEN_CLIENTIFY", "mock")
+
+    logger = logging.getLogger("bench_extract")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    import src.extract.cache as cache
+    import src.extract.sink as sink
+    from src.extract.clientify_api import ClientifyClient, extraccion_tiempos
+    from src.extract.extract import extract_all
+    from src.extract.rate_limiter import RateLimiter
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Checkpoints (ruta relativa), caché y sink fuera del proyecto
+        os.chdir(tmp)
+        cache.CACHE_DIR = Path(tmp) / "cache"
+        sink.TMP_DIR = Path(tmp) / "tmp"
+
+        paginas_antes = stats.paginas
+        data, seg, pico = medir(
+            lambda: extract_all(
+                logger,
+                max_workers=args.workers,
+                streaming=not args.sin_streaming,
+                refrescar_cache=True,
+                limiter=RateLimiter(rate=args.rate, max_rate=args.max_rate),
+            )
+        )
+        paginas = stats.paginas - paginas_antes
+        filas = sum(len(df) for df in data.values())
+        print("== extract_all ==")
+        print(f"  endpoints: {len(data)}  filas: {filas}  páginas: {paginas}")
+        print(f"  tiempo: {seg:.2f}s  páginas/s: {paginas / seg:.1f}  pico memoria: {pico:.1f} MB")
+
+        # Segunda ejecución: checkpoints confirmados (como tras guardar en
+        # data/raw) y caché de referencia vencida → filtro [gte] y peticiones
+        # condicionales (304) contra el mock
+        for extraccion in data.values():
+            for _ in extraccion.bloques():
+                pass
+            extraccion.confirmar(logger)
+        os.environ["CACHE_TTL_HORAS"] = "0"
+        peticiones_antes, paginas_antes, r304_antes = stats.peticiones, stats.paginas, stats.r304
+        data, seg, pico = medir(
+            lambda: extract_all(
+                logger,
+                max_workers=args.workers,
+                streaming=not args.sin_streaming,
+                limiter=RateLimiter(rate=args.rate, max_rate=args.max_rate),
+            )
+        )
+        filas = sum(len(df) for df in data.values())
+        print("== extract_all incremental (checkpoints + caché condicional) ==")
+        print(
+            f"  filas: {filas}  páginas: {stats.paginas - paginas_antes}  "
+            f"304: {stats.r304 - r304_antes}  peticiones: {stats.peticiones - peticiones_antes}"
+        )
+        print(f"  tiempo: {seg:.2f}s  pico memoria: {pico:.1f} MB")
+        for extraccion in data.values():
+            extraccion.confirmar(logger)
+
+        client = ClientifyClient(
+            logger,
+            max_workers=args.workers,
+            limiter=RateLimiter(rate=args.rate, max_rate=args.max_rate),
+        )
+        deal_ids = [ID_BASE + i for i in range(args.deals)]
+        df, seg, pico = medir(
+            lambda: extraccion_tiempos(
+                logger, client=client, deal_ids=deal_ids, progreso_cada=10**9
+            )
+        )
+        print("== extraccion_tiempos ==")
+        print(f"  deals: {len(deal_ids)}  registros: {len(df)}  404: {stats.deals_404}")
+        print(f"  tiempo: {seg:.2f}s  deals/s: {len(deal_ids) / seg:.1f}  pico memoria: {pico:.1f} MB")
+        print(f"== servidor == peticiones: {stats.peticiones}  429: {stats.r429}  304: {stats.r304}")
+
+        os.chdir(root)
+
+    servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
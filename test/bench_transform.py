@@ -0,0 +1,221 @@
+"""
+Benchmark de los pasos más costosos de Transform con datos sintéticos.
+
+Compara la implementación por filas anterior (referencia incluida aquí) con la
+vectorizada de src/transform/utils.py, verifica que el resultado sea idéntico
+y reporta el tiempo de cada una.
+
+Uso:
+    python test/bench_transform.py --deals 200000 --deal-times 100000 --tasks 500000
+"""
+import argparse
+import ast
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pandas as pd
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+
+from src.transform.utils import (  # noqa: E402
+    desanidar_columna,
+    expand_stage_durations,
+    separar_fecha_hora,
+)
+
+CAMPOS = [
+    ("Modo", ["EXPORTACIÓN", "IMPORTACIÓN"]),
+    ("Linea de Servicio", [["Carga Internacional"], ["Aduanas", "Transporte"]]),
+    ("Tipo de Requerimiento", ["COTIZACIÓN", "SEGUIMIENTO"]),
+    ("Modalidad", ["MARÍTIMA", "AÉREA", None]),
+    ("TRM", ["3817.59", "4012.10"]),
+    ("Término Negociación", [["EXW"], ["FOB", "CIF"]]),
+    ("País de Origen", ["Colombia", "México", "España"]),
+    ("Profit Estimado", ["195", "1200"]),
+]
+
+
+def deals_sinteticos(n: int, semilla: int = 42) -> pd.DataFrame:
+    """deals con custom_fields como texto (igual que en data/raw/deals.csv)."""
+    rnd = random.Random(semilla)
+    filas = []
+    for i in range(n):
+        campos = rnd.sample(CAMPOS, rnd.randint(0, len(CAMPOS)))
+        custom = [
+            {"id": i * 10 + j, "field": campo, "value": rnd.choice(valores)}
+            for j, (campo, valores) in enumerate(campos)
+        ]
+        filas.append({"id": 10_000_000 + i, "custom_fields": str(custom)})
+    return pd.DataFrame(filas)
+
+
+def deal_times_sinteticos(n: int, semilla: int = 42) -> pd.DataFrame:
+    """deal_times con stages_duration como texto (igual que en data/raw)."""
+    rnd = random.Random(semilla)
+    filas = []
+    for i in range(n):
+        etapas = [
+            {
+                "stage_name": f"Etapa {e}",
+                "stage_duration": {
+                    "days": rnd.randint(0, 60),
+                    "hours": rnd.randint(0, 23),
+                    "minutes": rnd.randint(0, 59),
+                },
+            }
+            for e in range(rnd.randint(0, 8))
+        ]
+        filas.append({"id": 10_000_000 + i, "stages_duration": str(etapas)})
+    return pd.DataFrame(filas)
+
+
+def tasks_sinteticas(n: int, semilla: int = 42) -> pd.DataFrame:
+    """Columnas de fecha de tasks como texto ISO 8601 con zona (≈10% nulos)."""
+    rnd = random.Random(semilla)
+    base = datetime(2024, 1, 1, tzinfo=timezone(timedelta(hours=1)))
+    columnas = {}
+    for col in ("start_datetime", "due_date", "created", "modified"):
+        columnas[col] = [
+            None
+            if rnd.random() < 0.1
+            else (base + timedelta(seconds=rnd.randint(0, 60_000_000))).isoformat()
+            for _ in range(n)
+        ]
+    return pd.DataFrame(columnas)
+
+
+def fechas_por_objetos(df: pd.DataFrame, columnas: list) -> pd.DataFrame:
+    """Implementación anterior de separar_fecha_hora (.dt.date / .dt.time)."""
+    for col in columnas:
+        df[col] = pd.to_datetime(df[col], errors="coerce", utc=True)
+        df[f"{col}_fecha"] = df[col].dt.date
+        df[f"{col}_hora"] = df[col].dt.time
+        df = df.drop(columns=[col])
+    return df
+
+
+def como_objetos(df: pd.DataFrame) -> pd.DataFrame:
+    """Valores Python con None como nulo, para comparar dtypes distintos."""
+    return df.astype(object).where(df.notna(), None)
+
+
+def desanidar_por_filas(df: pd.DataFrame, columna: str) -> pd.DataFrame:
+    """Implementación anterior (literal_eval y un dict por fila), como referencia."""
+    listas = df[columna].apply(lambda x: ast.literal_eval(x) if isinstance(x, str) else x)
+    filas_expandidas = []
+    for lista_diccionarios in listas:
+        fila = {}
+        for item in lista_diccionarios:
+            valor = item.get("value")
+            if isinstance(valor, list):
+                valor = ", ".join(valor)
+            fila[item.get("field")] = valor
+        filas_expandidas.append(fila)
+    df_desanidado = pd.DataFrame(filas_expandidas)
+    df_desanidado.index = df.index
+    return df_desanidado
+
+
+def etapas_por_filas(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Implementación anterior de expand_stage_durations (iterrows y literal_eval),
+    con los tipos y la columna total_minutes de la versión actual.
+    """
+    registros = []
+    for _, row in df[["id", "stages_duration"]].iterrows():
+        for item in ast.literal_eval(row["stages_duration"]):
+            dur = item.get("stage_duration", {})
+            registros.append(
+                {
+                    "id": row["id"],
+                    "stage_name": item.get("stage_name", None),
+                    "days": dur.get("days", None),
+                    "hours": dur.get("hours", None),
+                    "minutes": dur.get("minutes", None),
+                }
+            )
+    resultado = pd.DataFrame(registros)
+    for unidad in ("days", "hours", "minutes"):
+        resultado[unidad] = resultado[unidad].astype("Int64")
+    resultado["total_minutes"] = (
+        resultado["days"] * 1440 + resultado["hours"] * 60 + resultado["minutes"]
+    )
+    return resultado
+
+
+def medir(funcion):
+    """Ejecuta funcion() y devuelve (resultado, segundos)."""
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return resultado, time.perf_counter() - inicio
+
+
+def comparar(nombre: str, anterior, nueva, ajustar=None):
+    """
+    Ejecuta ambas versiones, verifica igualdad y muestra tiempos.
+    ajustar se aplica a ambos resultados antes de comparar (p. ej. dtypes).
+    Devuelve los resultados (anterior, nueva).
+    """
+    esperado, seg_anterior = medir(anterior)
+    obtenido, seg_nueva = medir(nueva)
+    ajustar = ajustar or (lambda df: df)
+    pd.testing.assert_frame_equal(ajustar(obtenido), ajustar(esperado))
+    print(f"== {nombre} ==")
+    print(f"  filas salida: {len(obtenido)}  columnas: {len(obtenido.columns)}")
+    print(
+        f"  por filas: {seg_anterior:.2f}s  vectorizado: {seg_nueva:.2f}s  "
+        f"aceleración: x{seg_anterior / seg_nueva:.1f}  (resultado idéntico)"
+    )
+    return esperado, obtenido
+
+
+def comparar_salida(anterior: pd.DataFrame, nueva: pd.DataFrame):
+    """Memoria en pandas y tiempo de escritura Parquet de ambos resultados."""
+    with tempfile.TemporaryDirectory() as tmp:
+        for etiqueta, df in (("anterior", anterior), ("nueva", nueva)):
+            memoria = df.memory_usage(deep=True).sum() / 1024**2
+            _, segundos = medir(
+                lambda: df.to_parquet(Path(tmp) / f"{etiqueta}.parquet", index=False)
+            )
+            print(f"  {etiqueta}: memoria {memoria:.1f} MB  to_parquet {segundos:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de Transform")
+    parser.add_argument("--deals", type=int, default=50000)
+    parser.add_argument("--deal-times", type=int, default=50000)
+    parser.add_argument("--tasks", type=int, default=200000)
+    args = parser.parse_args()
+
+    deals = deals_sinteticos(args.deals)
+    comparar(
+        "desanidar_columna (custom_fields)",
+        lambda: desanidar_por_filas(deals[["id", "custom_fields"]], "custom_fields"),
+        lambda: desanidar_columna(deals[["id", "custom_fields"]], "custom_fields"),
+    )
+
+    deal_times = deal_times_sinteticos(args.deal_times)
+    comparar(
+        "expand_stage_durations (deal_times)",
+        lambda: etapas_por_filas(deal_times),
+        lambda: expand_stage_durations(deal_times),
+    )
+
+    tasks = tasks_sinteticas(args.tasks)
+    columnas = list(tasks.columns)
+    anterior, nueva = comparar(
+        "separar_fecha_hora (tasks)",
+        lambda: fechas_por_objetos(tasks.copy(), columnas),
+        lambda: separar_fecha_hora(tasks.copy(), columnas),
+        ajustar=como_objetos,
+    )
+    comparar_salida(anterior, nueva)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+Servidor local que imita la API de Clientify para pruebas y benchmarks.
+
+Responde a todos los endpoints de config() con páginas sintéticas (o con
+respuestas grabadas) y a /deals/<id>/ con el detalle de cada deal.
+Permite configurar latencia, número de páginas, tasa de 404 y de 429.
+Aplica los filtros incrementales <campo>[gte] (modified, created) y responde
+con ETag / Last-Modified; una petición condicional (If-None-Match o
+If-Modified-Since) sobre datos sin cambios recibe un 304 sin cuerpo.
+
+Uso:
+    python test/mock_clientify.py --puerto 8765 --paginas 50 --latencia 0.05
+    (luego BASE_URL=http://127.0.0.1:8765/v1 en el entorno del ETL)
+"""
+import argparse
+import hashlib
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root))
+
+from src.extract.clientify_api import config  # noqa: E402
+
+PAGE_SIZE_DEFECTO = 20
+ID_BASE = 10_000_000
+
+# Fechas sintéticas: el registro i se crea en _fecha(i) y se modifica en
+# _fecha(i + DESFASE[campo]); ambas crecen con i
+FECHA_BASE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+MINUTOS_POR_REGISTRO = 37
+DESFASE = {"created": 0, "modified": 500}
+
+
+class MockConfig:
+    """Parámetros del servidor simulado."""
+
+    def __init__(
+        self,
+        paginas: int = 10,
+        paginas_referencia: int = 1,
+        latencia: float = 0.0,
+        tasa_404: float = 0.0,
+        tasa_429: float = 0.0,
+        retry_after: float = 1.0,
+        grabaciones: Path = None,
+        semilla: int = 42,
+    ):
+        self.paginas = paginas
+        self.paginas_referencia = paginas_referencia
+        self.latencia = latencia
+        self.tasa_404 = tasa_404
+        self.tasa_429 = tasa_429
+        self.retry_after = retry_after
+        self.grabaciones = Path(grabaciones) if grabaciones else None
+        self.semilla = semilla
+
+
+class Estadisticas:
+    """Contadores de peticiones servidas (seguros entre hilos)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.peticiones = 0
+        self.paginas = 0
+        self.deals = 0
+        self.deals_404 = 0
+        self.r429 = 0
+        self.r404 = 0
+        self.r304 = 0
+
+    def sumar(self, campo: str):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+            self.peticiones += 1
+
+
+def _fecha(i: int) -> str:
+    return (FECHA_BASE + timedelta(minutes=MINUTOS_POR_REGISTRO * i)).isoformat()
+
+
+def _a_datetime(texto: str) -> datetime:
+    """Fecha ISO 8601 (con o sin zona; sin zona se toma UTC)."""
+    fecha = datetime.fromisoformat(texto.replace("Z", "+00:00"))
+    return fecha if fecha.tzinfo else fecha.replace(tzinfo=timezone.utc)
+
+
+def filtros_fecha(query: dict) -> dict:
+    """{campo: fecha} de los parámetros <campo>[gte] de la consulta."""
+    return {
+        clave[: -len("[gte]")]: _a_datetime(valores[0])
+        for clave, valores in query.items()
+        if clave.endswith("[gte]") and valores and valores[0]
+    }
+
+
+def primer_indice(filtros: dict) -> int:
+    """Primer registro sintético que cumple todos los filtros <campo>[gte]."""
+    inicio = 0
+    for campo, desde in filtros.items():
+        if campo not in DESFASE:
+            continue
+        minutos = (desde - FECHA_BASE).total_seconds() / 60
+        i = -(-minutos // MINUTOS_POR_REGISTRO) - DESFASE[campo]  # techo
+        inicio = max(inicio, int(i))
+    return inicio
+
+
+def validadores(ruta: str, filtros: dict, ultimo_modified: str, total: int) -> tuple:
+    """(ETag, Last-Modified) del resultado completo de la consulta."""
+    firma = f"{ruta}|{sorted((c, d.isoformat()) for c, d in filtros.items())}|{total}|{ultimo_modified}"
+    etag = '"' + hashlib.md5(firma.encode()).hexdigest() + '"'
+    fecha = _a_datetime(ultimo_modified) if ultimo_modified else FECHA_BASE
+    return etag, format_datetime(fecha.astimezone(timezone.utc), usegmt=True)
+
+
+def sin_cambios(headers, etag: str, last_modified: str) -> bool:
+    """True si la petición condicional coincide con la versión actual (304)."""
+    if_none_match = headers.get("If-None-Match")
+    if if_none_match:
+        return etag in [e.strip() for e in if_none_match.split(",")]
+    if_modified_since = headers.get("If-Modified-Since")
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def registro_sintetico(endpoint: str, i: int) -> dict:
+    """Registro con la forma aproximada de cada endpoint de Clientify."""
+    url_api = "https://api.clientify.net/v1"
+    registro = {
+        "id": ID_BASE + i,
+        "url": f"{url_api}{endpoint}{ID_BASE + i}/",
+        "name": f"{endpoint.strip('/')} {i}",
+        "owner": f"{url_api}/users/{327000 + i % 18}/",
+        "created": _fecha(i),
+        "modified": _fecha(i + DESFASE["modified"]),
+    }
+    if endpoint == "/deals/":
+        registro.update(
+            {
+                "amount": round(1000 + i * 13.7, 2),
+                "contact": f"{url_api}/contacts/{ID_BASE + i % 997}/",
+                "company": f"{url_api}/companies/{ID_BASE + i % 311}/",
+                "status": i % 3,
+                "tags": [],
+                "custom_fields": [
+                    {"id": i * 10 + 1, "field": "Modo", "value": "EXPORTACIÓN"},
+                    {"id": i * 10 + 2, "field": "Linea de Servicio", "value": ["Carga Internacional"]},
+                ],
+            }
+        )
+    elif endpoint in ("/contacts/", "/companies/"):
+        registro.update(
+            {
+                "first_name": f"Nombre {i}",
+                "emails": [{"id": i, "type": 4, "email": f"c{i}@example.com"}],
+                "custom_fields": [],
+            }
+        )
+    elif endpoint == "/tasks/":
+        registro.update(
+            {
+                "deals": f"{url_api}/deals/{ID_BASE + i}/",
+                "start_datetime": _fecha(i + 10),
+                "due_date": _fecha(i + 20),
+            }
+        )
+    elif endpoint == "/calls/":
+        registro.update(
+            {
+                "duration": i % 600,
+                "register_date": _fecha(i + 5),
+                "related_deals": [f"{url_api}/deals/{ID_BASE + i}/"],
+            }
+        )
+    return registro
+
+
+def detalle_deal(deal_id: int) -> dict:
+    """Detalle de /deals/<id>/ con stages_duration."""
+    return {
+        "id": deal_id,
+        "name": f"deal {deal_id}",
+        "modified": _fecha(deal_id % 1000),
+        "stages_duration": [
+            {
+                "stage_name": f"Etapa {n}",
+                "stage_duration": {"days": (deal_id + n) % 30, "hours": n, "minutes": deal_id % 60},
+            }
+            for n in range(1 + deal_id % 4)
+        ],
+    }
+
+
+def crear_handler(cfg: MockConfig, stats: Estadisticas, endpoints: dict):
+    """Construye el handler HTTP con la configuración indicada."""
+    rutas = set(endpoints.values())
+    referencia = {"/users/", "/deals/pipelines/stages/", "/tasks/types/", "/deals/pipelines/"}
+    rnd = random.Random(cfg.semilla)
+    rnd_lock = threading.Lock()
+    patron_deal = re.compile(r"^/deals/(\d+)/?$")
+    grabadas = {}
+
+    def azar() -> float:
+        with rnd_lock:
+            return rnd.random()
+
+    def registros_grabados(endpoint: str):
+        if not cfg.grabaciones:
+            return None
+        if endpoint not in grabadas:
+            archivo = cfg.grabaciones / f"{endpoint.strip('/').replace('/', '_')}.json"
+            grabadas[endpoint] = (
+                json.loads(archivo.read_text(encoding="utf-8")) if archivo.exists() else None
+            )
+        return grabadas[endpoint]
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _json(self, estado: int, cuerpo=None, headers: dict = None):
+            datos = json.dumps(cuerpo).encode() if cuerpo is not None else b""
+            self.send_response(estado)
+            if estado != 304:
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(datos)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def do_GET(self):
+            if cfg.latencia:
+                time.sleep(cfg.latencia)
+
+            if cfg.tasa_429 and azar() < cfg.tasa_429:
+                stats.sumar("r429")
+                return self._json(
+                    429, {"detail": "Request was throttled."}, {"Retry-After": str(cfg.retry_after)}
+                )
+
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            ruta = url.path
+            base = urlparse(self.server.base_path).path.rstrip("/")
+            if base and ruta.startswith(base):
+                ruta = ruta[len(base):]
+
+            m = patron_deal.match(ruta)
+            if m:
+                if cfg.tasa_404 and azar() < cfg.tasa_404:
+                    stats.sumar("deals_404")
+                    return self._json(404, {"detail": "Not found."})
+                stats.sumar("deals")
+                return self._json(200, detalle_deal(int(m.group(1))))
+
+            if ruta not in rutas:
+                stats.sumar("r404")
+                return self._json(404, {"detail": "Not found."})
+
+            page = int(query.get("page", ["1"])[0])
+            try:
+                page_size = int(query.get("page_size", [PAGE_SIZE_DEFECTO])[0])
+            except ValueError:
+                page_size = PAGE_SIZE_DEFECTO
+
+            filtros = filtros_fecha(query)
+            grabados = registros_grabados(ruta)
+            if grabados is not None:
+                # Registros grabados: se filtran por el valor de cada campo
+                grabados = [
+                    r for r in grabados
+                    if all(r.get(c) and _a_datetime(r[c]) >= d for c, d in filtros.items())
+                ]
+                total = len(grabados)
+                desde = 0
+                ultimo = max((r.get("modified") or "" for r in grabados), default="")
+            else:
+                paginas = cfg.paginas_referencia if ruta in referencia else cfg.paginas
+                desde = min(primer_indice(filtros), paginas * page_size)
+                total = paginas * page_size - desde
+                ultimo = _fecha(desde + total - 1 + DESFASE["modified"]) if total else ""
+
+            etag, last_modified = validadores(ruta, filtros, ultimo, total)
+            cabeceras = {"ETag": etag, "Last-Modified": last_modified}
+            if sin_cambios(self.headers, etag, last_modified):
+                stats.sumar("r304")
+                return self._json(304, headers=cabeceras)
+
+            inicio = (page - 1) * page_size
+            if page < 1 or (inicio >= total and page > 1):
+                stats.sumar("r404")
+                return self._json(404, {"detail": "Invalid page."})
+
+            fin = min(total, inicio + page_size)
+            if grabados is not None:
+                resultados = grabados[inicio:fin]
+            else:
+                resultados = [registro_sintetico(ruta, desde + i) for i in range(inicio, fin)]
+
+            stats.sumar("paginas")
+            siguiente = f"{ruta}?page={page + 1}" if fin < total else None
+            return self._json(
+                200,
+                {"count": total, "next": siguiente, "previous": None, "results": resultados},
+                cabeceras,
+            )
+
+    return Handler
+
+
+def iniciar_servidor(cfg: MockConfig = None, puerto: int = 0, host: str = "127.0.0.1"):
+    """
+    Arranca el servidor en un hilo. Devuelve (servidor, base_url, estadisticas).
+    """
+    cfg = cfg or MockConfig()
+    stats = Estadisticas()
+    _, _, endpoints = config(logging.getLogger("mock_clientify"))
+    servidor = ThreadingHTTPServer((host, puerto), crear_handler(cfg, stats, endpoints))
+    servidor.daemon_threads = True
+    base_url = f"http://{host}:{servidor.server_port}/v1"
+    servidor.base_path = base_url
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, base_url, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API de Clientify simulada")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--paginas", type=int, default=10)
+    parser.add_argument("--paginas-referencia", type=int, default=1)
+    parser.add_argument("--latencia", type=float, default=0.0)
+    parser.add_argument("--tasa-404", type=float, default=0.0)
+    parser.add_argument("--tasa-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--grabaciones", type=Path, default=None)
+    args = parser.parse_args()
+
+    cfg = MockConfig(
+        paginas=args.paginas,
+        paginas_referencia=args.paginas_referencia,
+        latencia=args.latencia,
+        tasa_404=args.tasa_404,
+        tasa_429=args.tasa_429,
+        retry_after=args.retry_after,
+        grabaciones=args.grabaciones,
+    )
+    servidor, base_url, _ = iniciar_servidor(cfg, puerto=args.puerto)
+    print(f"Mock de Clientify en {base_url} (Ctrl+C para salir)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()